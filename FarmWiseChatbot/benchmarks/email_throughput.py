@@ -0,0 +1,87 @@
+"""
+Load test: verification email throughput against the local SMTP sink.
+
+Compares the old path (render_template plus a fresh Flask-Mail connection,
+i.e. TCP + EHLO + AUTH, for every email) with mailer.py (precompiled
+template plus pooled long-lived connections). The sink's --handshake-delay
+stands in for the TLS/AUTH round trips to a real provider.
+
+Usage:
+    python benchmarks/email_throughput.py [emails] [--handshake-delay 0.2] [--threads 4]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask, render_template
+from flask_mail import Mail, Message
+import mailer
+from smtp_sink import SMTPSink
+
+def create_app(port):
+    app = Flask(__name__, template_folder=os.path.join(ROOT, 'templates'))
+    app.config.update(
+        MAIL_SERVER='127.0.0.1', MAIL_PORT=port, MAIL_USE_TLS=False, MAIL_USE_SSL=False,
+        MAIL_USERNAME='bench@farmwise.local', MAIL_PASSWORD='secret', MAIL_DEFAULT_SENDER='bench@farmwise.local',
+        MAIL_TIMEOUT=30, MAIL_POOL_SIZE=4, MAIL_POOL_MAX_IDLE=60, MAIL_POOL_MAX_MESSAGES=100
+    )
+    Mail(app)
+    return app
+
+def build_message(index, render):
+    email = f'farmer{index}@example.com'
+    msg = Message('Verify Your Email - FarmWise', sender=('FarmWise', 'bench@farmwise.local'), recipients=[email])
+    msg.html = render('email/verify_email.html', otp=f'{index % 1000000:06d}', email=email, expiry_minutes=10)
+    msg.body = f"Your FarmWise verification code is: {index % 1000000:06d}"
+    return msg
+
+def send_fresh_connection(app, index):
+    with app.app_context():
+        app.extensions['mail'].send(build_message(index, render_template))
+
+def send_pooled(app, index):
+    with app.app_context():
+        mailer.send_message(build_message(index, mailer.render_email))
+
+def run(label, app, sink, send, emails, threads):
+    connections_before = sink.connections
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda index: send(app, index), range(emails)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {emails / elapsed:>9.1f} emails/sec  "
+          f"{sink.connections - connections_before:>5} handshakes  {elapsed:.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-email SMTP connections with the pooled mailer')
+    parser.add_argument('emails', type=int, nargs='?', default=200)
+    parser.add_argument('--handshake-delay', type=float, default=0.2)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    sink = SMTPSink(port=0, handshake_delay=args.handshake_delay)
+    app = create_app(sink.start())
+
+    with app.app_context():
+        start = time.perf_counter()
+        for _ in range(1000):
+            render_template('email/verify_email.html', otp='123456', email='a@b.c', expiry_minutes=10)
+        jinja_us = (time.perf_counter() - start) * 1000
+        mailer.render_email('email/verify_email.html', otp='123456', email='a@b.c', expiry_minutes=10)
+        start = time.perf_counter()
+        for _ in range(1000):
+            mailer.render_email('email/verify_email.html', otp='123456', email='a@b.c', expiry_minutes=10)
+        precompiled_us = (time.perf_counter() - start) * 1000
+    print(f"render: jinja {jinja_us:.1f} µs/email, precompiled {precompiled_us:.1f} µs/email")
+
+    run('fresh connection per email', app, sink, send_fresh_connection, args.emails, args.threads)
+    run('pooled mailer', app, sink, send_pooled, args.emails, args.threads)
+    print(f"mailer stats: {mailer.stats()}")
+
+if __name__ == '__main__':
+    main()
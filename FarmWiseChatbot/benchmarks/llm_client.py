@@ -0,0 +1,54 @@
+"""
+Micro-benchmark: per-call overhead of setting up a Gemini model.
+
+Compares the old pattern (genai.configure + new GenerativeModel on every
+call) with the shared llm.ModelRegistry. No request is sent: each iteration
+stops after building the model and fetching the SDK's generative client,
+which is exactly the work generate_content does before touching the network.
+
+Usage:
+    python benchmarks/llm_client.py [iterations]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google.generativeai as genai
+from google.generativeai.client import get_default_generative_client
+from llm import ModelRegistry
+
+API_KEY = os.environ.get('GEMINI_API_KEY', 'benchmark-key')
+MODEL_NAME = 'gemini-1.5-flash'
+
+def per_call_setup():
+    """What chatbot.py and utils.translate_text used to do on every call"""
+    genai.configure(api_key=API_KEY)
+    model = genai.GenerativeModel(MODEL_NAME)
+    get_default_generative_client()
+    return model
+
+def shared_registry(registry):
+    """What they do now"""
+    model = registry.get_model()
+    get_default_generative_client()
+    return model
+
+def measure(label, func, iterations):
+    func()  # Warm up imports and lazy initialisation
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    per_call_us = elapsed / iterations * 1e6
+    print(f"{label:<20} {iterations} calls in {elapsed * 1000:.1f} ms ({per_call_us:.1f} us/call)")
+    return per_call_us
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    registry = ModelRegistry(API_KEY, MODEL_NAME)
+
+    before = measure('per-call setup', per_call_setup, iterations)
+    after = measure('shared registry', lambda: shared_registry(registry), iterations)
+    print(f"Speed-up: {before / after:.1f}x")
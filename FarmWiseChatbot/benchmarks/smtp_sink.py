@@ -0,0 +1,88 @@
+"""
+Local SMTP stand-in for load tests.
+
+Accepts and discards every message, speaking just enough ESMTP (EHLO,
+AUTH PLAIN, MAIL, RCPT, DATA, RSET, NOOP, QUIT) for smtplib and
+Flask-Mail. --handshake-delay adds latency to each new connection to
+mimic the TCP + TLS + AUTH round trips of a real provider.
+
+Usage:
+    python benchmarks/smtp_sink.py [--port 2525] [--handshake-delay 0.3]
+
+Then point the app at it:
+    MAIL_SERVER=127.0.0.1 MAIL_PORT=2525 MAIL_USE_TLS=false python email_worker.py
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+class SinkHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        time.sleep(server.handshake_delay)
+        self._reply('220 farmwise-sink ESMTP')
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip().upper()
+
+            if command.startswith(('EHLO', 'HELO')):
+                self.wfile.write(b'250-farmwise-sink\r\n250-8BITMIME\r\n250-AUTH PLAIN\r\n250 SIZE 10485760\r\n')
+            elif command.startswith('AUTH'):
+                self._reply('235 2.7.0 Authentication successful')
+            elif command.startswith(('MAIL', 'RCPT', 'RSET', 'NOOP')):
+                self._reply('250 OK')
+            elif command == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                with server.lock:
+                    server.messages += 1
+                self._reply('250 OK: queued')
+            elif command == 'QUIT':
+                self._reply('221 Bye')
+                return
+            else:
+                self._reply('502 Command not implemented')
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=2525, handshake_delay=0.0):
+        super().__init__((host, port), SinkHandler)
+        self.handshake_delay = handshake_delay
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+
+    def start(self):
+        """Serve from a background thread; returns the bound port"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.server_address[1]
+
+def main():
+    parser = argparse.ArgumentParser(description='Local SMTP server that accepts and discards mail')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2525)
+    parser.add_argument('--handshake-delay', type=float, default=0.0,
+                        help='Seconds of latency added to every new connection')
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.host, args.port, args.handshake_delay)
+    print(f"SMTP sink listening on {args.host}:{args.port}")
+    try:
+        sink.serve_forever()
+    except KeyboardInterrupt:
+        print(f"{sink.messages} messages over {sink.connections} connections")
+
+if __name__ == '__main__':
+    main()
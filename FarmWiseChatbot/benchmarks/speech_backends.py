@@ -0,0 +1,96 @@
+"""
+Benchmark: latency and CPU time of each speech recognition backend.
+
+Runs every backend over a fixed corpus of WAV clips laid out as
+<corpus>/<language code>/*.wav (one directory per supported language) and
+prints per-language wall-clock latency and process CPU time. Backends whose
+package or model is missing are skipped.
+
+Usage:
+    python benchmarks/speech_backends.py <corpus dir> [--backends google,vosk,whisper]
+        [--vosk-models models/vosk] [--whisper-model small] [--runs 3]
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import speech_recognition as sr
+from speech_backends import BackendUnavailable, GOOGLE_LANGUAGE_MAP, create_backend
+
+def load_corpus(corpus_dir):
+    """Read every clip once so file I/O isn't part of the measurement"""
+    corpus = {}
+    for language in GOOGLE_LANGUAGE_MAP:
+        clips = []
+        for path in sorted(glob.glob(os.path.join(corpus_dir, language, '*.wav'))):
+            with sr.AudioFile(path) as source:
+                clips.append((path, sr.Recognizer().record(source)))
+        if clips:
+            corpus[language] = clips
+    return corpus
+
+def bench_backend(backend, corpus, runs):
+    rows = []
+    for language, clips in corpus.items():
+        try:
+            if hasattr(backend, 'load'):
+                backend.load(language)  # Model loading is a one-off per worker, not per query
+        except BackendUnavailable as e:
+            rows.append((language, None, None, None, str(e)))
+            continue
+
+        latencies = []
+        cpu_times = []
+        audio_seconds = sum(len(audio.frame_data) / (audio.sample_rate * audio.sample_width) for _, audio in clips)
+        errors = 0
+        for _ in range(runs):
+            for _, audio in clips:
+                wall_start = time.perf_counter()
+                cpu_start = time.process_time()
+                try:
+                    backend.recognize(audio, language)
+                except Exception:
+                    errors += 1
+                latencies.append((time.perf_counter() - wall_start) * 1000)
+                cpu_times.append((time.process_time() - cpu_start) * 1000)
+
+        real_time_factor = sum(latencies) / 1000 / (audio_seconds * runs)
+        note = f"{errors} errors" if errors else ''
+        rows.append((language, statistics.median(latencies), statistics.median(cpu_times), real_time_factor, note))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare speech recognition backends on a fixed corpus')
+    parser.add_argument('corpus', help='Directory with one sub-directory of WAV clips per language code')
+    parser.add_argument('--backends', default='google,vosk,whisper')
+    parser.add_argument('--vosk-models', default='models/vosk')
+    parser.add_argument('--whisper-model', default='small')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        sys.exit(f"No clips found under {args.corpus}/<language>/*.wav")
+
+    config = {'STT_VOSK_MODEL_DIR': args.vosk_models, 'STT_WHISPER_MODEL': args.whisper_model}
+    print(f"{'backend':<8} {'lang':<5} {'p50 ms':>9} {'cpu ms':>9} {'RTF':>6}  notes")
+    for name in args.backends.split(','):
+        try:
+            backend = create_backend(name, config)
+        except BackendUnavailable as e:
+            print(f"{name:<8} skipped: {e}")
+            continue
+
+        for language, latency, cpu, rtf, note in bench_backend(backend, corpus, args.runs):
+            if latency is None:
+                print(f"{name:<8} {language:<5} {'-':>9} {'-':>9} {'-':>6}  {note}")
+            else:
+                print(f"{name:<8} {language:<5} {latency:>9.1f} {cpu:>9.1f} {rtf:>6.2f}  {note}")
+
+if __name__ == '__main__':
+    main()
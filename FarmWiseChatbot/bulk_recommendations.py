@@ -0,0 +1,250 @@
+"""
+Bulk crop recommendations for cooperatives and extension officers.
+
+Scores thousands of plots against the crop catalog with NumPy array
+operations, groups plots that end up with the same shortlist and writes
+one narrative per distinct shortlist. Results are streamed as NDJSON.
+
+Usage:
+    python bulk_recommendations.py plots.csv [--narratives] [--language hi] > results.ndjson
+"""
+import argparse
+import csv
+import io
+import json
+import math
+import sys
+import numpy as np
+import catalog
+from crop_engine import WEIGHTS, current_season
+
+class CropMatrix:
+    """The crop catalog laid out as arrays, one column per crop"""
+
+    def __init__(self, crops):
+        self.crops = crops
+        self.names = [crop['name'] for crop in crops]
+        self.min_ph = np.array([crop['min_ph'] for crop in crops], dtype=float)
+        self.max_ph = np.array([crop['max_ph'] for crop in crops], dtype=float)
+        self.min_temperature = np.array([crop['min_temperature'] for crop in crops], dtype=float)
+        self.max_temperature = np.array([crop['max_temperature'] for crop in crops], dtype=float)
+
+        self.soils = sorted({soil.lower() for crop in crops for soil in crop['suitable_soil_types']})
+        self.soil_index = {soil: i for i, soil in enumerate(self.soils)}
+        self.soil_matrix = np.zeros((len(self.soils), len(crops)), dtype=bool)
+        for column, crop in enumerate(crops):
+            for soil in crop['suitable_soil_types']:
+                self.soil_matrix[self.soil_index[soil.lower()], column] = True
+
+        self.states = sorted({state for crop in crops for state in crop['major_states']})
+        self.state_matrix = np.zeros((len(self.states), len(crops)), dtype=bool)
+        for row, state in enumerate(self.states):
+            for column, crop in enumerate(crops):
+                self.state_matrix[row, column] = state in crop['major_states']
+
+        self.seasons = ['Kharif', 'Rabi', 'Zaid']
+        self.season_matrix = np.array([
+            [season in crop['growing_season'] or 'Year-round' in crop['growing_season'] for crop in crops]
+            for season in self.seasons
+        ], dtype=bool)
+
+    def find_state(self, location):
+        """Row of the first major state mentioned in a location, or -1"""
+        location = (location or '').lower()
+        return next((row for row, state in enumerate(self.states) if state.lower() in location), -1)
+
+_matrix = None
+_matrix_source = None
+
+def get_matrix():
+    """Return the crop matrix, rebuilding it when the catalog reloads"""
+    global _matrix, _matrix_source
+
+    crops = catalog.get_crops()
+    if crops is not _matrix_source:
+        _matrix = CropMatrix(crops)
+        _matrix_source = crops
+    return _matrix
+
+def _centrality(values, low, high):
+    """Vectorised crop_engine._centrality over a (plots x crops) grid"""
+    half_width = (high - low) / 2.0
+    safe_width = np.where(half_width > 0, half_width, 1.0)
+    distance = np.minimum(np.abs(values - (low + half_width)) / safe_width, 1.0)
+    return np.where(half_width > 0, 1.0 - 0.5 * distance, 1.0)
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def score_plots(plots, season=None, limit=5):
+    """
+    Score every plot against every crop at once
+
+    Uses the same filters and weights as crop_engine.shortlist: a crop is a
+    candidate when the plot's pH (and temperature, when given) is in range
+    and, for soil types the catalog knows, the soil matches.
+
+    Args:
+        plots (list): Dicts with soil_type, soil_ph, location and optional temperature
+        season (str): Cropping season; defaults to the current one
+        limit (int): Maximum crops per shortlist
+
+    Returns:
+        list: One shortlist per plot, each a list of (crop name, score) pairs
+    """
+    matrix = get_matrix()
+    season = season or current_season()
+    if not plots:
+        return []
+
+    ph = np.array([_to_float(plot.get('soil_ph')) for plot in plots])[:, None]
+    temperature = np.array([_to_float(plot.get('temperature')) for plot in plots])[:, None]
+    soil_rows = np.array([matrix.soil_index.get((plot.get('soil_type') or '').strip().lower(), -1)
+                          for plot in plots])
+
+    # Plots from the same district share a location string, so match each one once
+    states_by_location = {}
+    for plot in plots:
+        location = plot.get('location')
+        if location not in states_by_location:
+            states_by_location[location] = matrix.find_state(location)
+    state_rows = np.array([states_by_location[plot.get('location')] for plot in plots])
+
+    has_soil = (soil_rows >= 0)[:, None]
+    has_temperature = ~np.isnan(temperature)
+
+    # Hard filters
+    candidates = (ph >= matrix.min_ph) & (ph <= matrix.max_ph)
+    soil_match = np.where(has_soil, matrix.soil_matrix[np.maximum(soil_rows, 0)], True)
+    candidates &= soil_match
+    temperature_ok = (temperature >= matrix.min_temperature) & (temperature <= matrix.max_temperature)
+    candidates &= np.where(has_temperature, temperature_ok, True)
+
+    # Scores, normalised by the best score possible with the inputs given
+    score = WEIGHTS['ph'] * _centrality(ph, matrix.min_ph, matrix.max_ph)
+    score = score + WEIGHTS['soil'] * has_soil
+    score = score + np.where(has_temperature,
+                             WEIGHTS['temperature'] * _centrality(temperature, matrix.min_temperature,
+                                                                  matrix.max_temperature),
+                             0.0)
+    state_match = np.where((state_rows >= 0)[:, None], matrix.state_matrix[np.maximum(state_rows, 0)], False)
+    score = score + WEIGHTS['state'] * state_match
+    if season in matrix.seasons:
+        score = score + WEIGHTS['season'] * matrix.season_matrix[matrix.seasons.index(season)]
+
+    # Unknown soil types still count the soil weight, as in crop_engine.shortlist
+    max_score = (WEIGHTS['ph'] + WEIGHTS['soil'] + WEIGHTS['state'] + WEIGHTS['season']
+                 + WEIGHTS['temperature'] * has_temperature)
+    score = np.where(candidates, np.round(score / max_score, 3), -1.0)
+
+    # Stable sort on negated scores keeps catalog order for ties
+    order = np.argsort(-score, axis=1, kind='stable')[:, :limit]
+    top_scores = np.take_along_axis(score, order, axis=1)
+
+    shortlists = []
+    for columns, scores in zip(order.tolist(), top_scores.tolist()):
+        shortlists.append([(matrix.names[column], value) for column, value in zip(columns, scores) if value >= 0])
+    return shortlists
+
+def read_plots(data, content_type='application/json'):
+    """
+    Parse plots from a JSON list, a {'plots': [...]} object or CSV text
+
+    Raises:
+        ValueError: If the data isn't valid JSON or CSV, or isn't a list of plot objects
+    """
+    if 'csv' in content_type:
+        try:
+            return list(csv.DictReader(io.StringIO(data)))
+        except csv.Error as e:
+            raise ValueError(str(e))
+
+    parsed = json.loads(data)
+    if isinstance(parsed, dict):
+        parsed = parsed.get('plots', [])
+    if not isinstance(parsed, list) or not all(isinstance(plot, dict) for plot in parsed):
+        raise ValueError('Plots must be a list of objects')
+    return parsed
+
+def plot_error(plot):
+    """Why a plot can't be scored, or None if it can"""
+    if not math.isfinite(_to_float(plot.get('soil_ph'))):
+        return 'soil_ph must be a number'
+    # Optional, but a value that is given must be a number (CSV leaves it empty)
+    if plot.get('temperature') not in (None, '') and not math.isfinite(_to_float(plot['temperature'])):
+        return 'temperature must be a number'
+    for field in ('soil_type', 'location'):
+        if plot.get(field) is not None and not isinstance(plot[field], str):
+            return f'{field} must be a string'
+    return None
+
+def generate_ndjson(plots, narrate=None, season=None, limit=5):
+    """
+    Yield NDJSON lines: one 'narrative' line per distinct shortlist (before
+    the first plot that uses it) and one 'plot' line per plot, or an
+    'error' line for a plot that can't be scored
+
+    Args:
+        plots (list): Plot dicts
+        narrate (callable): Optional function(crop_names) -> text; called once per distinct shortlist
+        season (str): Cropping season; defaults to the current one
+        limit (int): Maximum crops per shortlist
+    """
+    errors = [plot_error(plot) for plot in plots]
+    shortlists = iter(score_plots([plot for plot, error in zip(plots, errors) if error is None], season, limit))
+    narrative_ids = {}
+
+    for index, (plot, error) in enumerate(zip(plots, errors)):
+        if error is not None:
+            yield json.dumps({'type': 'error', 'plot_id': plot.get('plot_id', index), 'error': error},
+                             ensure_ascii=False) + '\n'
+            continue
+
+        shortlist = next(shortlists)
+        names = tuple(name for name, _ in shortlist)
+        if names not in narrative_ids:
+            narrative_ids[names] = len(narrative_ids)
+            if narrate is not None and names:
+                yield json.dumps({
+                    'type': 'narrative',
+                    'narrative_id': narrative_ids[names],
+                    'crops': list(names),
+                    'narrative': narrate(list(names))
+                }, ensure_ascii=False) + '\n'
+
+        yield json.dumps({
+            'type': 'plot',
+            'plot_id': plot.get('plot_id', index),
+            'shortlist': [{'crop': name, 'score': score} for name, score in shortlist],
+            'narrative_id': narrative_ids[names] if names else None
+        }, ensure_ascii=False) + '\n'
+
+def main():
+    parser = argparse.ArgumentParser(description='Score plots against the crop catalog and print NDJSON')
+    parser.add_argument('input', help='CSV or JSON file of plots (plot_id, soil_type, soil_ph, location, temperature)')
+    parser.add_argument('--narratives', action='store_true', help='Generate one narrative per distinct shortlist')
+    parser.add_argument('--language', default='en', help='Narrative language code')
+    parser.add_argument('--season', help='Cropping season (Kharif, Rabi, Zaid); defaults to the current one')
+    parser.add_argument('--limit', type=int, default=5, help='Crops per shortlist')
+    args = parser.parse_args()
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        plots = read_plots(f.read(), 'text/csv' if args.input.endswith('.csv') else 'application/json')
+
+    narrate = None
+    if args.narratives:
+        from app import app
+        from chatbot import describe_crop_shortlist
+
+        def narrate(crop_names):
+            with app.app_context():
+                return describe_crop_shortlist(crop_names, args.language)
+
+    for line in generate_ndjson(plots, narrate, args.season, args.limit):
+        sys.stdout.write(line)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'data')
+
+# How often (seconds) to stat the data files for changes
+RELOAD_CHECK_INTERVAL = 5
+
+class JsonCatalog:
+    """
+    A JSON data file parsed once and kept in memory.
+
+    The file's mtime is checked at most every RELOAD_CHECK_INTERVAL seconds
+    and the catalog is rebuilt when it changes, so edits to the data files
+    are picked up without a restart and requests never touch the disk.
+    """
+
+    def __init__(self, filename, build):
+        self.path = os.path.join(DATA_DIR, filename)
+        self._build = build
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._next_check = 0
+        self._data = None
+        self.reload()
+
+    def reload(self):
+        """Re-read and re-index the file"""
+        with self._lock:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._data = self._build(json.load(f))
+            self._mtime = mtime
+            self._next_check = time.monotonic() + RELOAD_CHECK_INTERVAL
+
+    @property
+    def data(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + RELOAD_CHECK_INTERVAL
+            try:
+                if os.stat(self.path).st_mtime != self._mtime:
+                    self.reload()
+            except (OSError, ValueError):
+                # Keep serving the last good copy if the file is mid-write or invalid
+                pass
+        return self._data
+
+class LanguageIndex:
+    def __init__(self, languages):
+        self.languages = languages
+        self.by_code = {lang['code']: lang for lang in languages}
+
+class IntervalIndex:
+    """Crops indexed by a [min, max] range, sorted by lower bound for bisect lookups"""
+
+    def __init__(self, crops, min_key, max_key):
+        self.max_key = max_key
+        self.intervals = sorted(crops, key=lambda crop: crop[min_key])
+        self.min_bounds = [crop[min_key] for crop in self.intervals]
+
+    def containing(self, value):
+        end = bisect.bisect_right(self.min_bounds, value)
+        return [crop for crop in self.intervals[:end] if crop[self.max_key] >= value]
+
+class CropIndex:
+    def __init__(self, crops):
+        self.crops = crops
+        # Catalog order breaks ties between equally scored crops
+        self.position = {crop['name']: i for i, crop in enumerate(crops)}
+
+        # soil type -> crops that grow in it
+        self.by_soil = {}
+        for crop in crops:
+            for soil in crop['suitable_soil_types']:
+                self.by_soil.setdefault(soil.lower(), []).append(crop)
+
+        self.by_ph = IntervalIndex(crops, 'min_ph', 'max_ph')
+        self.by_temperature = IntervalIndex(crops, 'min_temperature', 'max_temperature')
+
+languages = JsonCatalog('languages.json', LanguageIndex)
+crops = JsonCatalog('crops.json', CropIndex)
+
+def get_languages():
+    """Return the list of supported languages"""
+    return languages.data.languages
+
+def get_language_name(language_code):
+    """Get the full language name for a code, falling back to the code itself"""
+    language = languages.data.by_code.get(language_code)
+    return language['name'] if language else language_code
+
+def get_crops():
+    """Return every crop in the catalog"""
+    return crops.data.crops
+
+def crop_position(crop):
+    """Return a crop's position in the catalog"""
+    positions = crops.data.position
+    # A crop dropped by a reload mid-request sorts last
+    return positions.get(crop['name'], len(positions))
+
+def crops_for_soil(soil_type):
+    """Return the crops suited to a soil type"""
+    return crops.data.by_soil.get((soil_type or '').strip().lower(), [])
+
+def crops_for_ph(ph):
+    """Return the crops whose pH range includes ph"""
+    return crops.data.by_ph.containing(float(ph))
+
+def crops_for_temperature(temperature):
+    """Return the crops whose temperature range includes temperature"""
+    return crops.data.by_temperature.containing(float(temperature))
@@ -0,0 +1,86 @@
+from datetime import datetime
+from sqlalchemy import func, insert, update
+from app import db
+from models import Chat, Message
+from pagination import keyset_page
+
+def message_page(chat_id, before=None, limit=30):
+    """
+    A page of a chat's messages, walking back from the newest
+
+    Returns:
+        tuple: (messages oldest first, ready to display, cursor for the next older page or None)
+    """
+    messages, next_cursor = keyset_page(Message.query.filter_by(chat_id=chat_id), Message, before, limit)
+    messages.reverse()
+    return messages, next_cursor
+
+def chat_list_page(user_id, before=None, limit=10, with_previews=True):
+    """
+    A page of a user's chats, newest first, with each chat's first message as a preview
+
+    Returns:
+        tuple: (chats, {chat id: preview text}, cursor for the next page or None)
+    """
+    chats, next_cursor = keyset_page(Chat.query.filter_by(user_id=user_id), Chat, before, limit)
+
+    previews = {}
+    if chats and with_previews:
+        # One query for all previews instead of loading every chat's messages
+        first_ids = db.session.query(func.min(Message.id)).filter(
+            Message.chat_id.in_([chat.id for chat in chats])
+        ).group_by(Message.chat_id)
+        previews = {message.chat_id: message.content for message in Message.query.filter(Message.id.in_(first_ids))}
+
+    return chats, previews, next_cursor
+
+def chat_title(question):
+    """Title for a new chat, taken from its first question"""
+    return question[:50] + "..." if len(question) > 50 else question
+
+def save_exchange(chat_id, question, answer, asked_at, rename=False):
+    """
+    Save a question and its answer in one transaction
+
+    Both messages go in a single multi-row INSERT ... RETURNING, and a new
+    chat is named after the question in the same commit.
+
+    Args:
+        chat_id (int): Chat the exchange belongs to
+        question (str): The farmer's message
+        answer (str): The reply, or None to save only the question
+        asked_at (datetime): When the question arrived, so it sorts before the reply
+        rename (bool): True if the chat still has its default title
+
+    Returns:
+        int: id of the reply message, or None if no reply was saved
+    """
+    rows = [{'chat_id': chat_id, 'content': question, 'is_user': True, 'created_at': asked_at}]
+    if answer is not None:
+        rows.append({'chat_id': chat_id, 'content': answer, 'is_user': False, 'created_at': datetime.utcnow()})
+
+    inserted = db.session.execute(insert(Message).returning(Message.id, Message.is_user), rows).all()
+    if rename:
+        db.session.execute(update(Chat).where(Chat.id == chat_id, Chat.title == "New Chat")
+                           .values(title=chat_title(question)))
+    db.session.commit()
+    return next((message_id for message_id, is_user in inserted if not is_user), None)
+
+def serialize_message(message):
+    return {
+        'id': message.id,
+        'content': message.content,
+        'is_user': message.is_user,
+        'created_at': message.created_at.isoformat(),
+        'time': message.created_at.strftime('%H:%M')
+    }
+
+def serialize_chat(chat, preview=None):
+    return {
+        'id': chat.id,
+        'title': chat.title,
+        'created_at': chat.created_at.isoformat(),
+        'date': chat.created_at.strftime('%d %b, %Y'),
+        'short_date': chat.created_at.strftime('%d %b'),
+        'preview': preview
+    }
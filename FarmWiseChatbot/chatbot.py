@@ -1,79 +1,179 @@
 import os
 import json
-import requests
-import google.generativeai as genai
 from app import app
+import catalog
+import crop_engine
+import llm
+import metrics
+import outbound
 
-# Initialize Gemini API
-GEMINI_API_KEY = app.config['GEMINI_API_KEY']
 YOUTUBE_API_KEY = app.config['YOUTUBE_API_KEY']
 
-genai.configure(api_key=GEMINI_API_KEY)
+# Characters of a streamed answer to inspect before trusting its language
+LANGUAGE_CHECK_CHARS = 200
 
-# Load crop data
-def load_crop_data():
-    with open('static/data/crops.json', 'r', encoding='utf-8') as f:
-        return json.load(f)
+CHAT_ERROR_MESSAGE = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
 
-def get_chatbot_response(message, user_profile, language='en'):
+def direct_language_generation(language):
     """
-    Get a response from the Gemini 2.0 Flash model
+    Whether the model should answer directly in the user's language
+    """
+    return language != 'en' and app.config['DIRECT_LANGUAGE_GENERATION']
+
+def language_instruction(language):
+    """
+    Prompt suffix asking the model to answer in the target language
+    """
+    if not direct_language_generation(language):
+        return ""
+    
+    language_name = catalog.get_language_name(language)
+    return (f"\n\nWrite your entire response in {language_name} using its native script. "
+            f"Keep crop, pest and chemical names understandable, but do not answer in English.")
+
+def localize_response(text, language):
+    """
+    Make sure a generated answer is in the target language.
+    
+    With direct generation the model already answered in the target language,
+    so the translation round trip only runs when that answer fails the
+    language check.
+    """
+    if language == 'en':
+        return text
+    
+    from utils import translate_text, is_text_in_language
+    if direct_language_generation(language):
+        if is_text_in_language(text, language):
+            metrics.increment('generation.direct_language')
+            return text
+        app.logger.warning(f"Direct {language} generation failed language check, translating")
+        metrics.increment('generation.translation_fallback')
+    
+    return translate_text(text, language)
+
+def profile_context(user_profile):
+    """
+    Opening of the chat prompt describing the farmer, from their profile
+    """
+    context = "You are an agricultural assistant chatbot helping Indian farmers."
+    
+    if user_profile:
+        context += f" The farmer is from {user_profile.farm_location or 'India'}."
+        if user_profile.soil_type:
+            context += f" They have {user_profile.soil_type} soil with pH {user_profile.soil_ph}."
+        if user_profile.crops_grown:
+            context += f" They grow {user_profile.crops_grown}."
+    
+    return context
+
+def build_chat_prompt(message, user_profile, language='en', history='', context=None):
+    """
+    Build the Gemini prompt for a farmer's chat message, with the earlier
+    conversation (see conversation.build_history) when there is one.
+    context is profile_context(user_profile) when the caller already has it.
+    """
+    if context is None:
+        context = profile_context(user_profile)
+    
+    # Add instructions to provide structured advice
+    instructions = """
+    Based on the farmer's query, provide helpful agricultural advice.
+    If they ask about crops, suggest suitable options for their conditions.
+    If they ask about pests or diseases, provide identification tips and organic/chemical treatment options.
+    If they ask about irrigation, provide a schedule based on crop and season.
+    Structure your response clearly with headings and bullet points when appropriate.
+    Make your response informative but concise and easy to understand.
+    If they ask for videos, mention that you can suggest YouTube videos for them to watch.
+    """
+    
+    prompt = f"{context}\n\n{instructions}"
+    if history:
+        prompt += ("\n\nUse the earlier conversation to understand follow-up questions; "
+                   f"don't ask the farmer to repeat what they already said.\n\n{history}")
+    
+    return f"{prompt}\n\nFarmer's query: {message}{language_instruction(language)}"
+
+def get_chatbot_response(message, user_profile, language='en', history='', context=None):
+    """
+    Get a response from the chat model configured in llm.ModelRegistry
     """
     try:
-        # Create context from user profile
-        context = "You are an agricultural assistant chatbot helping Indian farmers."
-        
-        if user_profile:
-            context += f" The farmer is from {user_profile.farm_location or 'India'}."
-            if user_profile.soil_type:
-                context += f" They have {user_profile.soil_type} soil with pH {user_profile.soil_ph}."
-            if user_profile.crops_grown:
-                context += f" They grow {user_profile.crops_grown}."
-        
-        # Add instructions to provide structured advice
-        instructions = """
-        Based on the farmer's query, provide helpful agricultural advice.
-        If they ask about crops, suggest suitable options for their conditions.
-        If they ask about pests or diseases, provide identification tips and organic/chemical treatment options.
-        If they ask about irrigation, provide a schedule based on crop and season.
-        Structure your response clearly with headings and bullet points when appropriate.
-        Make your response informative but concise and easy to understand.
-        If they ask for videos, mention that you can suggest YouTube videos for them to watch.
-        """
-        
         # Generate response using Gemini
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content(
-            f"{context}\n\n{instructions}\n\nFarmer's query: {message}"
-        )
+        response = llm.generate(build_chat_prompt(message, user_profile, language, history, context))
         
-        formatted_response = response.text
+        return localize_response(response.text, language)
+    
+    except Exception as e:
+        app.logger.error(f"Error generating chatbot response: {str(e)}")
+        return CHAT_ERROR_MESSAGE
+
+def stream_chatbot_response(message, user_profile, language='en', history='', context=None):
+    """
+    Stream a response from Gemini, yielding text chunks as they arrive
+    """
+    try:
+        response = llm.generate(build_chat_prompt(message, user_profile, language, history, context), stream=True)
         
-        # If the language isn't English, we'll need to translate the response
-        if language != 'en':
-            # Import here to avoid circular imports
+        # Empty and safety-blocked chunks carry no text
+        texts = (chunk.text for chunk in response if chunk.text)
+        
+        if language == 'en':
+            yield from texts
+            return
+        
+        if not direct_language_generation(language):
+            # Translation needs the complete answer, so collect it before sending
             from utils import translate_text
-            formatted_response = translate_text(formatted_response, language)
-            
-        return formatted_response
+            full_text = ''.join(texts)
+            yield translate_text(full_text, language)
+            return
+        
+        # Hold back the start of the answer until it passes the language check,
+        # then stream the rest straight through
+        from utils import is_text_in_language
+        head = ''
+        for text in texts:
+            head += text
+            if len(head) >= LANGUAGE_CHECK_CHARS:
+                break
+        
+        if not is_text_in_language(head, language):
+            full_text = head + ''.join(texts)
+            yield localize_response(full_text, language)
+            return
+        
+        metrics.increment('generation.direct_language')
+        yield head
+        yield from texts
     
     except Exception as e:
-        app.logger.error(f"Error generating chatbot response: {str(e)}")
-        return "I'm sorry, I'm having trouble processing your request right now. Please try again later."
+        app.logger.error(f"Error streaming chatbot response: {str(e)}")
+        yield CHAT_ERROR_MESSAGE
 
-def get_crop_recommendations(soil_type, soil_ph, location, language='en'):
+def get_crop_recommendations(soil_type, soil_ph, location, language='en', temperature=None):
     """
     Get crop recommendations based on soil type, pH and location
     """
     try:
-        crops_data = load_crop_data()
+        # Rank suitable crops locally so the model only has to explain them
+        ranked = crop_engine.shortlist(soil_type, soil_ph, location, temperature)
+        
+        # The catalog only has English text, and translating it would be an LLM call
+        if (app.config['CROP_LOCAL_MODE'] and language == 'en'
+                and crop_engine.is_confident(ranked, app.config['CROP_LOCAL_CONFIDENCE'])):
+            metrics.increment('crop_recommendations.local')
+            return crop_engine.format_local_recommendations(ranked, soil_type, soil_ph, location)
         
-        # Filter crops based on soil type and pH
-        suitable_crops = []
-        for crop in crops_data:
-            if soil_type.lower() in crop['suitable_soil_types'] and \
-               float(soil_ph) >= crop['min_ph'] and float(soil_ph) <= crop['max_ph']:
-                suitable_crops.append(crop)
+        metrics.increment('crop_recommendations.llm')
+        if ranked:
+            candidates = f"""
+        These crops from our crop database match the farm's conditions, best first:
+        {crop_engine.format_shortlist_for_prompt(ranked)}
+        
+        Recommend from this list (you may skip unsuitable ones) and keep each crop's section short."""
+        else:
+            candidates = ""
         
         # Generate prompt for Gemini
         prompt = f"""
@@ -81,6 +181,7 @@ def get_crop_recommendations(soil_type, soil_ph, location, language='en'):
         - Soil type: {soil_type}
         - Soil pH: {soil_ph}
         - Location: {location}
+        {candidates}
         
         Provide crop recommendations for an Indian farmer. For each recommended crop, include:
         1. Best planting season
@@ -89,26 +190,45 @@ def get_crop_recommendations(soil_type, soil_ph, location, language='en'):
         4. Common pests and diseases to watch for
         5. Basic care instructions
         
-        Format the response in a clear, structured way.
+        Format the response in a clear, structured way.{language_instruction(language)}
         """
         
         # Generate response using Gemini
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content(prompt)
-        
-        recommendations = response.text
+        response = llm.generate(prompt)
         
-        # If the language isn't English, translate the response
-        if language != 'en':
-            from utils import translate_text
-            recommendations = translate_text(recommendations, language)
-            
-        return recommendations
+        return localize_response(response.text, language)
     
     except Exception as e:
         app.logger.error(f"Error generating crop recommendations: {str(e)}")
         return "I'm sorry, I couldn't generate crop recommendations at this time. Please try again later."
 
+def describe_crop_shortlist(crop_names, language='en'):
+    """
+    Write one narrative for a shortlist of crops, shared by every plot that got it
+    """
+    try:
+        crops = [crop for crop in catalog.get_crops() if crop['name'] in crop_names]
+        details = '\n'.join(
+            f"- {crop['name']}: seasons {', '.join(crop['growing_season'])}; water {crop['water_requirement']}; "
+            f"pests {', '.join(crop['common_pests'])}; diseases {', '.join(crop['common_diseases'])}"
+            for crop in crops
+        )
+        
+        prompt = f"""
+        These crops have been shortlisted for a group of Indian farms with similar soil and climate:
+        {details}
+        
+        For each crop, give 2-3 short bullet points on planting season, water management and the main
+        pest or disease risk. Format the response in a clear, structured way.{language_instruction(language)}
+        """
+        
+        response = llm.generate(prompt)
+        return localize_response(response.text, language)
+    
+    except Exception as e:
+        app.logger.error(f"Error describing crop shortlist: {str(e)}")
+        return ""
+
 def get_youtube_videos(query, language='en'):
     """
     Get relevant YouTube videos based on a query
@@ -133,7 +253,7 @@ def get_youtube_videos(query, language='en'):
             'relevanceLanguage': 'en'  # Default to English for wider results
         }
         
-        response = requests.get(url, params=params)
+        response = outbound.run(outbound.get(url, params), app.config['YOUTUBE_DEADLINE'], 'youtube.upstream')
         results = response.json()
         
         videos = []
@@ -148,12 +268,14 @@ def get_youtube_videos(query, language='en'):
                 }
                 videos.append(video)
         
-        # If language isn't English, translate titles and descriptions
-        if language != 'en':
-            from utils import translate_text
+        # If language isn't English, translate titles and descriptions in one call
+        if language != 'en' and videos:
+            from utils import translate_batch
+            fields = [video[field] for video in videos for field in ('title', 'description')]
+            translated = iter(translate_batch(fields, language))
             for video in videos:
-                video['title'] = translate_text(video['title'], language)
-                video['description'] = translate_text(video['description'], language)
+                video['title'] = next(translated)
+                video['description'] = next(translated)
         
         return videos
     
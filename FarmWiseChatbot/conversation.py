@@ -0,0 +1,158 @@
+"""
+Conversation memory for chats.
+
+The prompt for a new message carries the chat's rolling summary plus as
+many of the most recent messages as fit in CHAT_HISTORY_TOKEN_BUDGET.
+Messages that fall out of that window are folded into Chat.summary in
+the background. Each update only sends the previous summary and the newly
+evicted messages, so the summary is extended rather than recomputed and
+the prompt stays bounded however long the chat gets.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from app import app, db
+from models import Chat, Message
+import llm
+import metrics
+
+# Longest excerpt of one message used in the prompt or fed to the summary
+MESSAGE_CHARS_MAX = 2000
+
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='chat-summary')
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate without a round trip to the tokenizer
+
+    Roughly four bytes of UTF-8 per token, which also holds up for the
+    Indic scripts (three bytes per character, denser tokenization).
+    """
+    return len(text.encode('utf-8')) // 4 + 1
+
+def _recent_messages(chat):
+    """Unsummarized messages of a chat, newest first"""
+    query = Message.query.filter(Message.chat_id == chat.id)
+    if chat.summary_message_id:
+        query = query.filter(Message.id > chat.summary_message_id)
+    return query.order_by(Message.created_at.desc(), Message.id.desc()).limit(
+        app.config['CHAT_HISTORY_MAX_MESSAGES']).all()
+
+def split_window(messages, budget):
+    """
+    Split newest-first messages into the window that fits the token budget
+    and the older overflow
+
+    Returns:
+        tuple: (window oldest first, overflow oldest first)
+    """
+    used = 0
+    cut = len(messages)
+    for index, message in enumerate(messages):
+        used += estimate_tokens(message.content[:MESSAGE_CHARS_MAX])
+        if used > budget:
+            cut = index
+            break
+    return messages[:cut][::-1], messages[cut:][::-1]
+
+def _format_turns(messages):
+    return '\n'.join(f"{'Farmer' if message.is_user else 'Assistant'}: {message.content[:MESSAGE_CHARS_MAX]}"
+                     for message in messages)
+
+def build_history(chat):
+    """
+    Conversation context for the next prompt: the rolling summary and the
+    recent turns that fit the token budget
+
+    Args:
+        chat (Chat): The chat being answered, before the new question is saved
+
+    Returns:
+        str: Context block for the prompt, or "" for a new chat
+    """
+    window, _ = split_window(_recent_messages(chat), app.config['CHAT_HISTORY_TOKEN_BUDGET'])
+
+    parts = []
+    if chat.summary:
+        parts.append(f"Summary of the earlier conversation:\n{chat.summary}")
+    if window:
+        parts.append(f"Recent conversation:\n{_format_turns(window)}")
+
+    history = '\n\n'.join(parts)
+    metrics.observe('conversation.history_tokens', estimate_tokens(history) if history else 0)
+    return history
+
+def build_summary_prompt(summary, messages):
+    word_limit = app.config['CHAT_SUMMARY_WORDS']
+    return f"""You maintain a running summary of a conversation between a farmer and an agricultural assistant.
+
+Current summary:
+{summary or '(none yet)'}
+
+New messages to add:
+{_format_turns(messages)}
+
+Write the updated summary in English in at most {word_limit} words. Keep the farmer's crops,
+location, soil, problems, decisions and advice already given; drop greetings and repetition.
+Return only the summary."""
+
+def _unsummarized_batch(chat_id, after_id, through_id):
+    """Oldest messages of a chat after the summarized ones, up to through_id, oldest first"""
+    query = Message.query.filter(Message.chat_id == chat_id, Message.id <= through_id)
+    if after_id:
+        query = query.filter(Message.id > after_id)
+    return query.order_by(Message.id).limit(app.config['CHAT_HISTORY_MAX_MESSAGES']).all()
+
+def update_summary(chat_id):
+    """
+    Fold messages that no longer fit the history window into the chat's summary
+
+    Every message between the last summarized one and the window is folded
+    in, oldest first and at most CHAT_HISTORY_MAX_MESSAGES per model call,
+    so a backlog left by a failed or lost update isn't skipped.
+
+    Returns:
+        bool: True if the summary was extended
+    """
+    chat = db.session.get(Chat, chat_id)
+    if chat is None:
+        return False
+
+    _, overflow = split_window(_recent_messages(chat), app.config['CHAT_HISTORY_TOKEN_BUDGET'])
+    if not overflow:
+        return False
+
+    summary, summary_message_id = chat.summary, chat.summary_message_id
+    extended = False
+    while True:
+        batch = _unsummarized_batch(chat_id, summary_message_id, overflow[-1].id)
+        if not batch:
+            return extended
+
+        try:
+            with metrics.timer('conversation.summarize'):
+                new_summary = llm.generate(build_summary_prompt(summary, batch)).text.strip()
+        except Exception as e:
+            app.logger.error(f"Error summarizing chat {chat_id}: {str(e)}")
+            return extended
+
+        # Only apply the update if no other worker moved the summary on meanwhile
+        updated = Chat.query.filter(
+            Chat.id == chat_id,
+            Chat.summary_message_id.is_(None) if summary_message_id is None else Chat.summary_message_id == summary_message_id
+        ).update({'summary': new_summary, 'summary_message_id': batch[-1].id}, synchronize_session=False)
+        db.session.commit()
+        if not updated:
+            return extended
+
+        summary, summary_message_id = new_summary, batch[-1].id
+        extended = True
+
+def schedule_summary_update(chat_id):
+    """Update the chat's summary off the request path"""
+    def run():
+        with app.app_context():
+            try:
+                update_summary(chat_id)
+            finally:
+                db.session.remove()
+
+    _summary_executor.submit(run)
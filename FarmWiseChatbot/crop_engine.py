@@ -0,0 +1,130 @@
+from datetime import date
+import catalog
+
+# Score weights; a crop matching on every signal scores 1.0
+WEIGHTS = {
+    'soil': 0.3,
+    'ph': 0.25,
+    'temperature': 0.15,
+    'state': 0.15,
+    'season': 0.15,
+}
+
+def current_season(today=None):
+    """Return the Indian cropping season for a date"""
+    month = (today or date.today()).month
+    if 6 <= month <= 10:
+        return 'Kharif'
+    if month >= 11 or month <= 2:
+        return 'Rabi'
+    return 'Zaid'
+
+def _centrality(value, low, high):
+    """1.0 at the middle of [low, high], falling to 0.5 at the edges"""
+    half_width = (high - low) / 2.0
+    if half_width <= 0:
+        return 1.0
+    distance = abs(value - (low + half_width)) / half_width
+    return 1.0 - 0.5 * min(distance, 1.0)
+
+def _matching_state(crop, location):
+    location = (location or '').lower()
+    return next((state for state in crop['major_states'] if state.lower() in location), None)
+
+def shortlist(soil_type, soil_ph, location=None, temperature=None, season=None, limit=5):
+    """
+    Rank the crops suited to a farm's conditions
+
+    Crops must grow in the given soil (when the soil type is known to the
+    catalog), pH and temperature; the indexes narrow the candidates before
+    any scoring happens. Candidates are then scored on how central the pH and
+    temperature are to the crop's range, whether the farm is in one of the
+    crop's major states and whether the crop is grown this season. An
+    unknown soil type (often a typo) earns no soil points, so its scores
+    stay below a full match and is_confident never accepts them.
+
+    Args:
+        soil_type (str): Soil type, e.g. 'loamy'
+        soil_ph (float): Soil pH
+        location (str): Farm location, matched against major_states
+        temperature (float): Typical temperature in °C, if known
+        season (str): Cropping season; defaults to the current one
+        limit (int): Maximum number of crops to return
+
+    Returns:
+        list: Dicts with 'crop', 'score' (0-1), 'reasons' and 'soil_match', best first
+    """
+    soil_ph = float(soil_ph)
+    season = season or current_season()
+
+    candidates = catalog.crops_for_ph(soil_ph)
+    soil_candidates = catalog.crops_for_soil(soil_type)
+    if soil_candidates:
+        soil_ids = {id(crop) for crop in soil_candidates}
+        candidates = [crop for crop in candidates if id(crop) in soil_ids]
+    if temperature is not None:
+        temperature = float(temperature)
+        temperature_ids = {id(crop) for crop in catalog.crops_for_temperature(temperature)}
+        candidates = [crop for crop in candidates if id(crop) in temperature_ids]
+
+    max_score = WEIGHTS['ph'] + WEIGHTS['soil'] + WEIGHTS['state'] + WEIGHTS['season']
+    if temperature is not None:
+        max_score += WEIGHTS['temperature']
+
+    ranked = []
+    for crop in candidates:
+        reasons = [f"pH {soil_ph} is within {crop['min_ph']}-{crop['max_ph']}"]
+        score = WEIGHTS['ph'] * _centrality(soil_ph, crop['min_ph'], crop['max_ph'])
+
+        if soil_candidates:
+            score += WEIGHTS['soil']
+            reasons.append(f"grows well in {soil_type.lower()} soil")
+
+        if temperature is not None:
+            score += WEIGHTS['temperature'] * _centrality(temperature, crop['min_temperature'], crop['max_temperature'])
+            reasons.append(f"{temperature:g}°C is within {crop['min_temperature']}-{crop['max_temperature']}°C")
+
+        state = _matching_state(crop, location)
+        if state:
+            score += WEIGHTS['state']
+            reasons.append(f"major crop in {state}")
+
+        if season in crop['growing_season'] or 'Year-round' in crop['growing_season']:
+            score += WEIGHTS['season']
+            reasons.append(f"grown in the {season} season")
+
+        # Rounded the way np.round does, so bulk_recommendations.score_plots gives the same scores
+        ranked.append({'crop': crop, 'score': round(score / max_score * 1000) / 1000, 'reasons': reasons,
+                       'soil_match': bool(soil_candidates)})
+
+    # Ties keep catalog order, as in bulk_recommendations.score_plots
+    ranked.sort(key=lambda item: (-item['score'], catalog.crop_position(item['crop'])))
+    return ranked[:limit]
+
+def is_confident(ranked, threshold):
+    """Whether a shortlist is strong enough to answer without the LLM"""
+    return bool(ranked) and ranked[0]['soil_match'] and ranked[0]['score'] >= threshold
+
+def format_shortlist_for_prompt(ranked):
+    """Summarise a shortlist as prompt context"""
+    lines = []
+    for item in ranked:
+        crop = item['crop']
+        lines.append(f"- {crop['name']} (score {item['score']}): {'; '.join(item['reasons'])}. "
+                     f"Seasons: {', '.join(crop['growing_season'])}. Water: {crop['water_requirement']}.")
+    return '\n'.join(lines)
+
+def format_local_recommendations(ranked, soil_type, soil_ph, location):
+    """Write a recommendation answer straight from the crop catalog"""
+    lines = [f"## Recommended crops for {soil_type} soil (pH {soil_ph}) in {location or 'India'}", ""]
+    for index, item in enumerate(ranked, 1):
+        crop = item['crop']
+        lines.append(f"### {index}. {crop['name']} ({crop['scientific_name']})")
+        lines.append(f"- **Best planting season:** {', '.join(crop['growing_season'])}")
+        lines.append(f"- **Water requirements:** {crop['water_requirement']}")
+        lines.append(f"- **Suitable temperature:** {crop['min_temperature']}-{crop['max_temperature']}°C")
+        lines.append(f"- **Pests to watch for:** {', '.join(crop['common_pests'])}")
+        lines.append(f"- **Diseases to watch for:** {', '.join(crop['common_diseases'])}")
+        lines.append(f"- **Why it fits:** {'; '.join(item['reasons'])}")
+        lines.append("")
+    return '\n'.join(lines).strip()
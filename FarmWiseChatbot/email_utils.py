@@ -1,13 +1,12 @@
-from flask import current_app, render_template
+from flask import current_app
 from flask_mail import Message
+import json
 import random
 import string
 from datetime import datetime, timedelta
 from app import db
+import mailer
 import logging
-import smtplib
-import ssl
-import time
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -18,6 +17,8 @@ class EmailVerification(db.Model):
     otp = db.Column(db.String(6), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_verified = db.Column(db.Boolean, default=False)
+    # verify_otp: latest unverified OTP for an email
+    __table_args__ = (db.Index('ix_email_verification_email_verified_created', 'email', 'is_verified', 'created_at'),)
 
 class PasswordReset(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -25,6 +26,22 @@ class PasswordReset(db.Model):
     token = db.Column(db.String(100), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_used = db.Column(db.Boolean, default=False)
+    # verify_reset_token: unused reset by token
+    __table_args__ = (db.Index('ix_password_reset_token_is_used', 'token', 'is_used'),)
+
+class EmailOutbox(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)
+    recipient = db.Column(db.String(120), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    # deliver_outbox_batch: due pending emails and expired claims
+    __table_args__ = (db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),)
 
 def generate_otp():
     """Generate a 6-digit OTP"""
@@ -34,72 +51,37 @@ def generate_reset_token():
     """Generate a secure token for password reset"""
     return ''.join(random.choices(string.ascii_letters + string.digits, k=32))
 
-def send_verification_email(email, otp):
-    """Send verification email with OTP"""
-    max_retries = 3
-    retry_delay = 5  # seconds
+def build_verification_message(email, otp):
+    """Build the verification email with OTP"""
+    msg = Message('Verify Your Email - FarmWise',
+                sender=('FarmWise', current_app.config['MAIL_USERNAME']),
+                recipients=[email])
     
-    for attempt in range(max_retries):
-        try:
-            msg = Message('Verify Your Email - FarmWise',
-                        sender=('FarmWise', current_app.config['MAIL_USERNAME']),
-                        recipients=[email])
-            
-            # Add email headers to improve deliverability
-            msg.headers = {
-                'List-Unsubscribe': f'<mailto:{current_app.config["MAIL_USERNAME"]}>',
-                'Precedence': 'bulk',
-                'X-Auto-Response-Suppress': 'OOF, AutoReply'
-            }
-            
-            # Render HTML template
-            msg.html = render_template('email/verify_email.html',
-                                    otp=otp,
-                                    email=email,
-                                    expiry_minutes=10)
-            
-            # Add plain text version as fallback
-            msg.body = f"""
-            Your FarmWise verification code is: {otp}
-            
-            This code will expire in 10 minutes.
-            
-            If you didn't request this code, please ignore this email.
-            """
-            
-            logger.info(f"Attempting to send email to {email} (Attempt {attempt + 1}/{max_retries})")
-            logger.debug(f"Mail configuration: MAIL_SERVER={current_app.config['MAIL_SERVER']}, "
-                        f"MAIL_PORT={current_app.config['MAIL_PORT']}, "
-                        f"MAIL_USE_SSL={current_app.config['MAIL_USE_SSL']}, "
-                        f"MAIL_USE_TLS={current_app.config['MAIL_USE_TLS']}")
-            
-            # Send email using Flask-Mail
-            current_app.extensions['mail'].send(msg)
-            logger.info(f"Email sent successfully to {email}")
-            return True
-            
-        except smtplib.SMTPAuthenticationError as e:
-            logger.error(f"SMTP Authentication Error: {str(e)}")
-            if attempt == max_retries - 1:
-                raise Exception("Failed to authenticate with email server. Please check your email credentials.")
-            time.sleep(retry_delay)
-            
-        except smtplib.SMTPException as e:
-            logger.error(f"SMTP Error: {str(e)}")
-            if attempt == max_retries - 1:
-                raise Exception("Failed to send email. Please try again later.")
-            time.sleep(retry_delay)
-            
-        except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
-            if attempt == max_retries - 1:
-                raise Exception(f"Failed to send verification email: {str(e)}")
-            time.sleep(retry_delay)
+    # Add email headers to improve deliverability
+    msg.headers = {
+        'List-Unsubscribe': f'<mailto:{current_app.config["MAIL_USERNAME"]}>',
+        'Precedence': 'bulk',
+        'X-Auto-Response-Suppress': 'OOF, AutoReply'
+    }
     
-    return False
+    # Render HTML template
+    msg.html = mailer.render_email('email/verify_email.html',
+                                   otp=otp,
+                                   email=email,
+                                   expiry_minutes=10)
+    
+    # Add plain text version as fallback
+    msg.body = f"""
+    Your FarmWise verification code is: {otp}
+    
+    This code will expire in 10 minutes.
+    
+    If you didn't request this code, please ignore this email.
+    """
+    return msg
 
-def send_password_reset_email(email, token):
-    """Send password reset email with token"""
+def build_password_reset_message(email, token):
+    """Build the password reset email with token"""
     reset_url = f"{current_app.config['BASE_URL']}/reset_password/{token}"
     
     msg = Message('Reset Your Password - FarmWise',
@@ -114,10 +96,10 @@ def send_password_reset_email(email, token):
     }
     
     # Render HTML template
-    msg.html = render_template('email/reset_password.html',
-                             reset_url=reset_url,
-                             email=email,
-                             expiry_hours=1)
+    msg.html = mailer.render_email('email/reset_password.html',
+                                   reset_url=reset_url,
+                                   email=email,
+                                   expiry_hours=1)
     
     # Add plain text version as fallback
     msg.body = f"""
@@ -128,8 +110,113 @@ def send_password_reset_email(email, token):
     
     If you didn't request this password reset, please ignore this email.
     """
+    return msg
+
+# Outbox message kinds and how to build each one from its payload
+MESSAGE_BUILDERS = {
+    'verification': lambda recipient, payload: build_verification_message(recipient, payload['otp']),
+    'password_reset': lambda recipient, payload: build_password_reset_message(recipient, payload['token']),
+}
+
+def queue_email(kind, recipient, **payload):
+    """Add an email to the outbox; it is sent once the caller's transaction commits"""
+    entry = EmailOutbox(kind=kind, recipient=recipient, payload=json.dumps(payload))
+    db.session.add(entry)
+    return entry
+
+def queue_verification_email(email, otp):
+    """Queue the verification email for the background sender"""
+    return queue_email('verification', email, otp=otp)
+
+def queue_password_reset_email(email, token):
+    """Queue the password reset email for the background sender"""
+    return queue_email('password_reset', email, token=token)
+
+def retry_delay(attempts):
+    """Exponential backoff before the next delivery attempt"""
+    base = current_app.config['EMAIL_RETRY_BASE_SECONDS']
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), current_app.config['EMAIL_RETRY_MAX_SECONDS']))
+
+def deliver_outbox_batch(batch_size=None):
+    """
+    Send one batch of due outbox emails over the pooled SMTP connection
+    
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED and marked
+    'sending' for EMAIL_CLAIM_TIMEOUT seconds, and the claim is committed
+    before anything is sent, so no transaction or row lock stays open across
+    the SMTP sends and several workers can drain the outbox without sending
+    anything twice. Claims of a worker that died mid-batch are released once
+    they time out. A failed email is retried with exponential backoff and
+    moved to 'dead' after EMAIL_MAX_ATTEMPTS attempts.
+    
+    Returns:
+        int: Number of emails processed (sent, retried or dead-lettered)
+    """
+    batch_size = batch_size or current_app.config['EMAIL_BATCH_SIZE']
+    now = datetime.utcnow()
+    
+    # Release claims whose worker stopped before recording the results
+    EmailOutbox.query.filter(
+        EmailOutbox.status == 'sending',
+        EmailOutbox.next_attempt_at <= now
+    ).update({'status': 'pending'}, synchronize_session=False)
+    
+    batch = EmailOutbox.query.filter(
+        EmailOutbox.status == 'pending',
+        EmailOutbox.next_attempt_at <= now
+    ).order_by(EmailOutbox.next_attempt_at).limit(batch_size).with_for_update(skip_locked=True).all()
+    
+    claimed_until = now + timedelta(seconds=current_app.config['EMAIL_CLAIM_TIMEOUT'])
+    emails = []
+    for entry in batch:
+        entry.status = 'sending'
+        entry.next_attempt_at = claimed_until
+        emails.append((entry.id, entry.kind, entry.recipient, entry.payload))
+    db.session.commit()
     
-    current_app.extensions['mail'].send(msg)
+    if not emails:
+        return 0
+    
+    # Outside any transaction: id -> time sent, or id -> error
+    sent = {}
+    failed = {}
+    for index, (email_id, kind, recipient, payload) in enumerate(emails):
+        try:
+            builder = MESSAGE_BUILDERS[kind]
+            mailer.send_message(builder(recipient, json.loads(payload)))
+            sent[email_id] = datetime.utcnow()
+            logger.info(f"Email {email_id} ({kind}) sent to {recipient}")
+        except Exception as e:
+            if mailer.is_connection_error(e):
+                # Server unreachable even after reconnecting: count it as a
+                # failed attempt for the rest of the batch and back off
+                logger.error(f"Could not reach mail server: {str(e)}")
+                for pending_id, *_ in emails[index:]:
+                    failed[pending_id] = f"Connection failed: {str(e)}"
+                break
+            failed[email_id] = str(e)
+    
+    for entry in EmailOutbox.query.filter(EmailOutbox.id.in_([email_id for email_id, *_ in emails])).all():
+        if entry.id in sent:
+            entry.status = 'sent'
+            entry.sent_at = sent[entry.id]
+            entry.attempts += 1
+        else:
+            _record_failure(entry, failed[entry.id])
+    
+    db.session.commit()
+    return len(emails)
+
+def _record_failure(entry, error):
+    entry.attempts += 1
+    entry.last_error = error
+    if entry.attempts >= current_app.config['EMAIL_MAX_ATTEMPTS']:
+        entry.status = 'dead'
+        logger.error(f"Email {entry.id} to {entry.recipient} dead-lettered after {entry.attempts} attempts: {error}")
+    else:
+        entry.status = 'pending'
+        entry.next_attempt_at = datetime.utcnow() + retry_delay(entry.attempts)
+        logger.warning(f"Email {entry.id} to {entry.recipient} failed (attempt {entry.attempts}): {error}")
 
 def verify_otp(email, otp):
     """Verify the OTP for email verification
@@ -159,9 +246,10 @@ def verify_otp(email, otp):
             
         # Verify the OTP
         if verification.otp == otp:
-            # Mark the verification as used
+            # Mark the verification as used; the caller commits it together
+            # with the user's verified flag
             verification.is_verified = True
-            db.session.commit()
+            db.session.flush()
             logger.info(f"OTP verified successfully for email: {email}")
             return True
             
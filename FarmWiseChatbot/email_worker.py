@@ -0,0 +1,68 @@
+"""
+Background sender for the email outbox.
+
+Signup, OTP resend and password reset only add a row to the outbox in
+their own transaction; this process delivers them. Each batch is sent
+over one SMTP connection, failures are retried with exponential backoff
+and emails that keep failing are marked 'dead' for inspection.
+
+Usage:
+    python email_worker.py [--once]
+"""
+import argparse
+import logging
+import signal
+import time
+from app import app
+from email_utils import deliver_outbox_batch
+import mailer
+
+logger = logging.getLogger(__name__)
+
+_stopping = False
+
+# Seconds between throughput log lines
+STATS_INTERVAL = 60
+
+def _stop(signum, frame):
+    global _stopping
+    _stopping = True
+
+def run(once=False):
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    last_stats = time.monotonic()
+    while not _stopping:
+        with app.app_context():
+            try:
+                processed = deliver_outbox_batch()
+            except Exception as e:
+                logger.error(f"Email outbox batch failed: {str(e)}")
+                processed = 0
+
+        if time.monotonic() - last_stats >= STATS_INTERVAL:
+            stats = mailer.stats(STATS_INTERVAL)
+            if stats['sent']:
+                logger.info(f"Mailer: {stats['emails_per_sec']} emails/sec, {stats['sent']} sent, "
+                            f"{stats['handshakes']} SMTP handshakes")
+            last_stats = time.monotonic()
+
+        if once and not processed:
+            break
+        # Keep draining while there is a backlog, otherwise poll
+        if not processed:
+            time.sleep(app.config['EMAIL_POLL_INTERVAL'])
+
+    mailer.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Send queued emails from the outbox')
+    parser.add_argument('--once', action='store_true', help='Drain the outbox and exit')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    run(args.once)
+
+if __name__ == '__main__':
+    main()
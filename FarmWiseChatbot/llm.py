@@ -0,0 +1,80 @@
+import threading
+
+class ModelRegistry:
+    """
+    Configures the Gemini SDK once and hands out shared GenerativeModel objects.
+
+    genai.configure() replaces the SDK's client, so calling it per request
+    throws away the underlying connection. The registry configures it a
+    single time and keeps one model object per (model name, generation
+    config), so every request reuses the same client and connection.
+    The SDK itself is imported on first use, since loading it takes most
+    of a second and would otherwise slow every worker's start.
+    """
+
+    def __init__(self, api_key, default_model='gemini-1.5-flash', generation_config=None):
+        self.api_key = api_key
+        self.default_model = default_model
+        self.generation_config = dict(generation_config or {})
+        self._models = {}
+        self._configured = False
+        self._lock = threading.Lock()
+
+    def _configure(self):
+        if not self._configured:
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+            self._configured = True
+
+    def get_model(self, model_name=None, **generation_config):
+        """Return the shared model for a name and generation config, building it on first use"""
+        config = dict(self.generation_config, **generation_config)
+        key = (model_name or self.default_model, tuple(sorted(config.items())))
+
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                self._configure()
+                import google.generativeai as genai
+                model = genai.GenerativeModel(key[0], generation_config=config or None)
+                self._models[key] = model
+            return model
+
+    def generate(self, prompt, stream=False, model_name=None, **generation_config):
+        """Generate content with a shared model"""
+        return self.get_model(model_name, **generation_config).generate_content(prompt, stream=stream)
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    """Return the process-wide registry, built from the app config on first use"""
+    global _registry
+
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                from app import app
+
+                generation_config = {}
+                if app.config.get('GEMINI_TEMPERATURE') is not None:
+                    generation_config['temperature'] = app.config['GEMINI_TEMPERATURE']
+                if app.config.get('GEMINI_MAX_OUTPUT_TOKENS') is not None:
+                    generation_config['max_output_tokens'] = app.config['GEMINI_MAX_OUTPUT_TOKENS']
+
+                _registry = ModelRegistry(app.config['GEMINI_API_KEY'],
+                                          app.config['GEMINI_MODEL'],
+                                          generation_config)
+    return _registry
+
+def get_model(model_name=None, **generation_config):
+    """Shortcut for get_registry().get_model()"""
+    return get_registry().get_model(model_name, **generation_config)
+
+def generate(prompt, stream=False, **generation_config):
+    """Shortcut for get_registry().generate()"""
+    return get_registry().generate(prompt, stream=stream, **generation_config)
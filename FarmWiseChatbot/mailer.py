@@ -0,0 +1,275 @@
+import collections
+import re
+import smtplib
+import threading
+import time
+from flask import current_app, render_template
+from flask_mail import BadHeaderError, email_dispatched, sanitize_address, sanitize_addresses
+from markupsafe import escape
+import metrics
+
+def is_connection_error(error):
+    """True when the SMTP connection itself failed, rather than the server refusing a message"""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    # SMTPException subclasses OSError, so check it before socket errors
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+class PrecompiledTemplate:
+    """
+    An email template split into its static HTML and the slots for its variables.
+
+    The template is rendered once with placeholder values; each send only
+    joins the static segments with the escaped values, skipping Jinja. The
+    split is checked against a normal render at compile time, and a
+    template that uses its variables in anything but plain {{ var }}
+    substitutions (filters, conditions, loops) falls back to render_template.
+    """
+
+    def __init__(self, name, variables):
+        self.name = name
+        self.variables = tuple(variables)
+        self.segments = None
+        self.slots = None
+        self._compile()
+
+    @staticmethod
+    def _placeholder(variable):
+        return f'@@fw-slot-{variable}@@'
+
+    def _compile(self):
+        rendered = render_template(self.name, **{var: self._placeholder(var) for var in self.variables})
+        pattern = '|'.join(re.escape(self._placeholder(var)) for var in self.variables)
+
+        segments = []
+        slots = []
+        position = 0
+        for match in re.finditer(pattern, rendered):
+            segments.append(rendered[position:match.start()])
+            slots.append(match.group(0)[len('@@fw-slot-'):-2])
+            position = match.end()
+        segments.append(rendered[position:])
+
+        self.segments, self.slots = segments, slots
+
+        probe = {var: f'<{var} & "probe">' for var in self.variables}
+        if self.render(**probe) != render_template(self.name, **probe):
+            current_app.logger.warning(f"Email template {self.name} can't be precompiled, rendering it with Jinja")
+            self.segments = self.slots = None
+
+    def render(self, **context):
+        if self.segments is None:
+            return render_template(self.name, **context)
+
+        parts = [self.segments[0]]
+        for slot, segment in zip(self.slots, self.segments[1:]):
+            parts.append(str(escape(context.get(slot, ''))))
+            parts.append(segment)
+        return ''.join(parts)
+
+# Email templates and the variables they are rendered with
+TEMPLATES = {
+    'email/verify_email.html': ('otp', 'email', 'expiry_minutes'),
+    'email/reset_password.html': ('reset_url', 'email', 'expiry_hours'),
+}
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+def render_email(name, **context):
+    """Render an email template from its precompiled form"""
+    template = _templates.get(name)
+    if template is None:
+        with _templates_lock:
+            template = _templates.get(name)
+            if template is None:
+                template = _templates[name] = PrecompiledTemplate(name, TEMPLATES[name])
+    return template.render(**context)
+
+def clear_templates():
+    """Drop precompiled templates, e.g. after editing them"""
+    with _templates_lock:
+        _templates.clear()
+
+class SMTPPool:
+    """
+    Long-lived SMTP connections shared by every sender in the process.
+
+    Connections are opened (connect, STARTTLS, login) on demand up to size,
+    returned to the pool after each message and reused. An idle connection
+    is checked with NOOP before reuse, connections are recycled after
+    max_messages, and a send that finds its connection dropped reconnects
+    and retries once.
+    """
+
+    def __init__(self, server, port, use_tls=False, use_ssl=False, username=None, password=None,
+                 timeout=30, size=2, max_idle=60, max_messages=100):
+        self.server = server
+        self.port = port
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_messages = max_messages
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._sent_times = collections.deque(maxlen=10000)
+        self.handshakes = 0
+        self.sent = 0
+
+    def _connect(self):
+        with metrics.timer('mailer.handshake'):
+            if self.use_ssl:
+                host = smtplib.SMTP_SSL(self.server, self.port, timeout=self.timeout)
+            else:
+                host = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+            try:
+                if self.use_tls:
+                    host.starttls()
+                if self.username and self.password:
+                    host.login(self.username, self.password)
+            except Exception:
+                host.close()
+                raise
+
+        metrics.increment('mailer.handshakes')
+        with self._lock:
+            self.handshakes += 1
+        return {'host': host, 'messages': 0, 'last_used': time.monotonic()}
+
+    def _close(self, connection):
+        try:
+            connection['host'].quit()
+        except Exception:
+            connection['host'].close()
+
+    def _acquire(self):
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+
+        if connection is not None and time.monotonic() - connection['last_used'] > self.max_idle:
+            # The server may have timed the connection out while it sat idle
+            try:
+                connection['host'].noop()
+            except Exception:
+                connection['host'].close()
+                connection = None
+
+        return connection or self._connect()
+
+    def _release(self, connection):
+        connection['last_used'] = time.monotonic()
+        if self.max_messages and connection['messages'] >= self.max_messages:
+            self._close(connection)
+            return
+        with self._lock:
+            self._idle.append(connection)
+
+    def sendmail(self, sender, recipients, message_bytes, mail_options=(), rcpt_options=()):
+        """Send one message over a pooled connection, reconnecting once if it was dropped"""
+        with self._slots:
+            connection = self._acquire()
+            try:
+                with metrics.timer('mailer.send'):
+                    try:
+                        connection['host'].sendmail(sender, recipients, message_bytes, mail_options, rcpt_options)
+                    except Exception as e:
+                        if not is_connection_error(e):
+                            raise
+                        connection['host'].close()
+                        metrics.increment('mailer.reconnects')
+                        connection = self._connect()
+                        connection['host'].sendmail(sender, recipients, message_bytes, mail_options, rcpt_options)
+            except Exception as e:
+                if is_connection_error(e):
+                    connection['host'].close()
+                else:
+                    # The server refused this message; the connection is still usable
+                    self._release(connection)
+                raise
+
+            connection['messages'] += 1
+            self._release(connection)
+
+        metrics.increment('mailer.sent')
+        with self._lock:
+            self.sent += 1
+            self._sent_times.append(time.monotonic())
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._close(connection)
+
+    def stats(self, window=60):
+        """Sent and handshake totals plus emails/sec over the last window seconds"""
+        now = time.monotonic()
+        with self._lock:
+            recent = sum(1 for sent_at in self._sent_times if now - sent_at <= window)
+            return {
+                'sent': self.sent,
+                'handshakes': self.handshakes,
+                'open_connections': len(self._idle),
+                'emails_per_sec': round(recent / window, 2)
+            }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Return the process-wide SMTP pool, built from the app's mail settings"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = current_app.config
+                _pool = SMTPPool(
+                    config['MAIL_SERVER'],
+                    config['MAIL_PORT'],
+                    use_tls=config['MAIL_USE_TLS'],
+                    use_ssl=config['MAIL_USE_SSL'],
+                    username=config['MAIL_USERNAME'],
+                    password=config['MAIL_PASSWORD'],
+                    timeout=config['MAIL_TIMEOUT'],
+                    size=config['MAIL_POOL_SIZE'],
+                    max_idle=config['MAIL_POOL_MAX_IDLE'],
+                    max_messages=config['MAIL_POOL_MAX_MESSAGES']
+                )
+    return _pool
+
+def close():
+    """Close the pooled SMTP connections, e.g. when a worker shuts down"""
+    if _pool is not None:
+        _pool.close()
+
+def send_message(message):
+    """
+    Send a Flask-Mail Message over the pooled SMTP connection
+
+    Honours MAIL_SUPPRESS_SEND and emits Flask-Mail's email_dispatched
+    signal, so mail.record_messages() keeps working.
+    """
+    mail = current_app.extensions['mail']
+    if message.has_bad_headers():
+        raise BadHeaderError
+    if message.date is None:
+        message.date = time.time()
+
+    if not mail.suppress:
+        get_pool().sendmail(
+            sanitize_address(message.sender),
+            list(sanitize_addresses(message.send_to)),
+            message.as_bytes(),
+            message.mail_options,
+            message.rcpt_options
+        )
+
+    email_dispatched.send(current_app._get_current_object(), message=message)
+
+def stats(window=60):
+    """Mailer throughput for /api/metrics and the worker logs"""
+    return _pool.stats(window) if _pool is not None else {'sent': 0, 'handshakes': 0, 'open_connections': 0, 'emails_per_sec': 0.0}
@@ -0,0 +1,64 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process counters and timing samples. Each gunicorn worker keeps its own
+# copy, which is enough for spotting regressions from the logs or /api/metrics.
+_lock = threading.Lock()
+_counters = {}
+_timings = {}
+
+# Keep only the most recent samples per timing so memory stays bounded
+MAX_SAMPLES = 1000
+
+def increment(name, value=1):
+    """Increase a named counter"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def observe(name, value):
+    """Record a timing sample (milliseconds) for a named metric"""
+    with _lock:
+        samples = _timings.setdefault(name, [])
+        samples.append(value)
+        if len(samples) > MAX_SAMPLES:
+            del samples[:len(samples) - MAX_SAMPLES]
+
+@contextmanager
+def timer(name):
+    """Time the wrapped block and record it in milliseconds"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, (time.perf_counter() - start) * 1000)
+
+def _percentile(sorted_samples, pct):
+    index = min(len(sorted_samples) - 1, int(round(pct / 100.0 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+def snapshot():
+    """Return a copy of all counters and summarised timings"""
+    with _lock:
+        counters = dict(_counters)
+        timings = {name: sorted(samples) for name, samples in _timings.items()}
+
+    summary = {}
+    for name, samples in timings.items():
+        if not samples:
+            continue
+        summary[name] = {
+            'count': len(samples),
+            'avg_ms': round(sum(samples) / len(samples), 2),
+            'p50_ms': round(_percentile(samples, 50), 2),
+            'p95_ms': round(_percentile(samples, 95), 2),
+            'max_ms': round(samples[-1], 2)
+        }
+
+    return {'counters': counters, 'timings': summary}
+
+def reset():
+    """Clear all recorded metrics"""
+    with _lock:
+        _counters.clear()
+        _timings.clear()
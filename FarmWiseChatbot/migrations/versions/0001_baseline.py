@@ -0,0 +1,129 @@
+"""baseline schema
+
+The schema as db.create_all() built it before migrations were introduced.
+Tables that already exist are left alone, so a database created by the app
+can be brought under migrations with a plain `flask db upgrade`.
+
+Revision ID: 0001_baseline
+Revises: 
+Create Date: 2026-10-18 02:40:36.844641
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'email_outbox' not in existing:
+        op.create_table('email_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=30), nullable=False),
+        sa.Column('recipient', sa.String(length=120), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=10), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'email_verification' not in existing:
+        op.create_table('email_verification',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('otp', sa.String(length=6), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('is_verified', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'password_reset' not in existing:
+        op.create_table('password_reset',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('token', sa.String(length=100), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('is_used', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'translation_cache_entry' not in existing:
+        op.create_table('translation_cache_entry',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('text_hash', sa.String(length=64), nullable=False),
+        sa.Column('language', sa.String(length=10), nullable=False),
+        sa.Column('translated_text', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('text_hash', 'language')
+        )
+        with op.batch_alter_table('translation_cache_entry', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_translation_cache_entry_created_at'), ['created_at'], unique=False)
+
+    if 'user' not in existing:
+        op.create_table('user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=64), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('password_hash', sa.String(length=256), nullable=False),
+        sa.Column('preferred_language', sa.String(length=10), nullable=True),
+        sa.Column('location', sa.String(length=100), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('is_email_verified', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+        sa.UniqueConstraint('username')
+        )
+    if 'chat' not in existing:
+        op.create_table('chat',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('title', sa.String(length=100), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'user_profile' not in existing:
+        op.create_table('user_profile',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('soil_type', sa.String(length=50), nullable=True),
+        sa.Column('soil_ph', sa.Float(), nullable=True),
+        sa.Column('farm_size', sa.Float(), nullable=True),
+        sa.Column('farm_location', sa.String(length=100), nullable=True),
+        sa.Column('crops_grown', sa.String(length=200), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'message' not in existing:
+        op.create_table('message',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('chat_id', sa.Integer(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('is_user', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['chat_id'], ['chat.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('message')
+    op.drop_table('user_profile')
+    op.drop_table('chat')
+    op.drop_table('user')
+    with op.batch_alter_table('translation_cache_entry', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_translation_cache_entry_created_at'))
+
+    op.drop_table('translation_cache_entry')
+    op.drop_table('password_reset')
+    op.drop_table('email_verification')
+    op.drop_table('email_outbox')
@@ -0,0 +1,58 @@
+"""indexes for hot lookups
+
+Composite indexes for the chat list, chat history, OTP, password reset and
+outbox queries, and one profile per user. Duplicate profiles (left behind by
+the old two-commit signup) are removed first, keeping each user's oldest.
+
+Indexes that db.create_all() already built are skipped, so databases created
+by the app before migrations can be stamped at 0001_baseline and upgraded.
+
+Revision ID: 0002_hot_lookup_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-18 02:40:49.930047
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_hot_lookup_indexes'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('chat', 'ix_chat_user_id_created_at', ['user_id', 'created_at']),
+    ('message', 'ix_message_chat_id_created_at', ['chat_id', 'created_at']),
+    ('email_verification', 'ix_email_verification_email_verified_created', ['email', 'is_verified', 'created_at']),
+    ('password_reset', 'ix_password_reset_token_is_used', ['token', 'is_used']),
+    ('email_outbox', 'ix_email_outbox_status_next_attempt', ['status', 'next_attempt_at']),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    for table, name, columns in INDEXES:
+        if name not in {index['name'] for index in inspector.get_indexes(table)}:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                batch_op.create_index(name, columns, unique=False)
+
+    existing = {constraint['name'] for constraint in inspector.get_unique_constraints('user_profile')}
+    if 'uq_user_profile_user_id' not in existing:
+        op.execute(
+            'DELETE FROM user_profile WHERE id NOT IN '
+            '(SELECT MIN(id) FROM user_profile GROUP BY user_id)'
+        )
+        with op.batch_alter_table('user_profile', schema=None) as batch_op:
+            batch_op.create_unique_constraint('uq_user_profile_user_id', ['user_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('user_profile', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_user_profile_user_id', type_='unique')
+
+    for table, name, _ in reversed(INDEXES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(name)
@@ -0,0 +1,44 @@
+"""keyset pagination indexes
+
+Extends the chat list and chat history indexes with id, so pages keyed on
+(created_at, id) are read straight from the index in order.
+
+Revision ID: 0003_keyset_pagination_indexes
+Revises: 0002_hot_lookup_indexes
+Create Date: 2026-10-18 02:43:12.417209
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_keyset_pagination_indexes'
+down_revision = '0002_hot_lookup_indexes'
+branch_labels = None
+depends_on = None
+
+# (table, old index, new index, new columns)
+INDEXES = [
+    ('chat', 'ix_chat_user_id_created_at', 'ix_chat_user_id_created_at_id', ['user_id', 'created_at', 'id']),
+    ('message', 'ix_message_chat_id_created_at', 'ix_message_chat_id_created_at_id', ['chat_id', 'created_at', 'id']),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    for table, old_name, new_name, columns in INDEXES:
+        existing = {index['name'] for index in inspector.get_indexes(table)}
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            if new_name not in existing:
+                batch_op.create_index(new_name, columns, unique=False)
+            if old_name in existing:
+                batch_op.drop_index(old_name)
+
+
+def downgrade():
+    for table, old_name, new_name, columns in INDEXES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(old_name, columns[:-1], unique=False)
+            batch_op.drop_index(new_name)
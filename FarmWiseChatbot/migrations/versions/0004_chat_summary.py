@@ -0,0 +1,35 @@
+"""chat summary
+
+Rolling conversation summary on chat, and the last message folded into it.
+Columns that db.create_all() already added are skipped.
+
+Revision ID: 0004_chat_summary
+Revises: 0003_keyset_pagination_indexes
+Create Date: 2026-10-18 02:45:39.948934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_chat_summary'
+down_revision = '0003_keyset_pagination_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('chat')}
+
+    with op.batch_alter_table('chat', schema=None) as batch_op:
+        if 'summary' not in existing:
+            batch_op.add_column(sa.Column('summary', sa.Text(), nullable=True))
+        if 'summary_message_id' not in existing:
+            batch_op.add_column(sa.Column('summary_message_id', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('chat', schema=None) as batch_op:
+        batch_op.drop_column('summary_message_id')
+        batch_op.drop_column('summary')
@@ -26,6 +26,11 @@ class Chat(db.Model):
     messages = db.relationship('Message', backref='chat', lazy=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     title = db.Column(db.String(100), default='New Chat')
+    # Rolling summary of the messages up to summary_message_id (conversation.py)
+    summary = db.Column(db.Text)
+    summary_message_id = db.Column(db.Integer)
+    # A user's chat list, newest first, paged on (created_at, id)
+    __table_args__ = (db.Index('ix_chat_user_id_created_at_id', 'user_id', 'created_at', 'id'),)
 
 class Message(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -33,6 +38,8 @@ class Message(db.Model):
     content = db.Column(db.Text, nullable=False)
     is_user = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # A chat's history in order, paged on (created_at, id)
+    __table_args__ = (db.Index('ix_message_chat_id_created_at_id', 'chat_id', 'created_at', 'id'),)
     
 class UserProfile(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -43,3 +50,13 @@ class UserProfile(db.Model):
     farm_location = db.Column(db.String(100))
     crops_grown = db.Column(db.String(200))
     user = db.relationship('User', backref=db.backref('profile', uselist=False))
+    # One profile per user; also serves the lookup by user_id
+    __table_args__ = (db.UniqueConstraint('user_id', name='uq_user_profile_user_id'),)
+
+class TranslationCacheEntry(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    text_hash = db.Column(db.String(64), nullable=False)
+    language = db.Column(db.String(10), nullable=False)
+    translated_text = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    __table_args__ = (db.UniqueConstraint('text_hash', 'language'),)
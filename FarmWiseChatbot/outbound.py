@@ -0,0 +1,138 @@
+"""
+Outbound calls to the external APIs (WeatherAPI, YouTube, Gemini).
+
+Each worker runs one asyncio event loop in a daemon thread, with one
+pooled httpx.AsyncClient on it. Views stay synchronous: they hand their
+upstream calls to the loop and wait for the result with a deadline, so
+independent calls (translation batches, weather for many locations) run
+concurrently instead of one after another, and a stuck upstream costs a
+request its deadline rather than a gunicorn thread.
+
+The Gemini SDK blocks, so its calls run in a bounded thread pool owned by
+the loop. Code run there must not use db.session: it is shared by every
+thread of the request. Do the cache reads and writes on the request thread.
+
+The loop, pool and client start on first use, after gunicorn has forked.
+"""
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from app import app
+import metrics
+
+# httpx logs every request URL, API keys included, and the app logs at DEBUG
+logging.getLogger('httpx').setLevel(logging.WARNING)
+logging.getLogger('httpcore').setLevel(logging.WARNING)
+
+class DeadlineExceeded(Exception):
+    """An outbound call didn't finish within its deadline"""
+
+_loop = None
+_client = None
+_lock = threading.Lock()
+
+def get_loop():
+    """The worker's outbound event loop, started on first use"""
+    global _loop
+
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                loop.set_default_executor(ThreadPoolExecutor(
+                    max_workers=app.config['OUTBOUND_BLOCKING_WORKERS'], thread_name_prefix='outbound'))
+                threading.Thread(target=loop.run_forever, name='outbound-loop', daemon=True).start()
+                _loop = loop
+    return _loop
+
+def _timeout(timeout):
+    import httpx
+
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
+
+def _get_client():
+    # Only ever called on the loop thread, so it needs no lock
+    global _client
+
+    if _client is None:
+        import httpx
+
+        pool_size = app.config['OUTBOUND_POOL_SIZE']
+        _client = httpx.AsyncClient(
+            timeout=_timeout((app.config['OUTBOUND_CONNECT_TIMEOUT'], app.config['OUTBOUND_TIMEOUT'])),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+    return _client
+
+async def get(url, params=None, timeout=None):
+    """
+    GET a URL with the shared client
+
+    Args:
+        url (str): URL to fetch
+        params (dict): Query string parameters
+        timeout (float or tuple): Per-request timeout, or (connect, read);
+            defaults to OUTBOUND_CONNECT_TIMEOUT and OUTBOUND_TIMEOUT
+
+    Returns:
+        httpx.Response: The response, whatever its status
+    """
+    kwargs = {} if timeout is None else {'timeout': _timeout(timeout)}
+    return await _get_client().get(url, params=params, **kwargs)
+
+async def call_blocking(func, *args, **kwargs):
+    """Run a blocking call, such as a Gemini SDK request, in the outbound thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+async def _gather(coros):
+    return await asyncio.gather(*coros, return_exceptions=True)
+
+def run(coro, deadline=None, name='outbound'):
+    """
+    Run a coroutine on the outbound loop and wait for its result
+
+    Past the deadline the coroutine is cancelled and DeadlineExceeded is
+    raised. A blocking call already running in the thread pool can't be
+    interrupted; it finishes in the background and its result is dropped.
+
+    Args:
+        coro: Coroutine to run, e.g. outbound.get(...)
+        deadline (float): Seconds to wait, or None to wait for as long as it takes
+        name (str): Metrics name, timed as <name> and counted as <name>.deadline_exceeded
+
+    Returns:
+        The coroutine's result; its exceptions are raised here
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    try:
+        with metrics.timer(name):
+            return future.result(timeout=deadline)
+    except FutureTimeoutError:
+        future.cancel()
+        metrics.increment(f'{name}.deadline_exceeded')
+        raise DeadlineExceeded(f"{name} took longer than {deadline}s")
+
+def gather(coros, deadline=None, name='outbound'):
+    """
+    Run independent coroutines concurrently and wait for all of them
+
+    Returns:
+        list: Results in the order of coros, with the exception in place
+            of the result for each call that failed
+    """
+    return run(_gather(list(coros)), deadline, name)
+
+def map_blocking(func, items, deadline=None, name='outbound'):
+    """
+    Call a blocking func(item) for every item concurrently in the thread pool
+
+    Returns:
+        list: Results in the order of items, with the exception in place
+            of the result for each call that failed
+    """
+    return gather((call_blocking(func, item) for item in items), deadline, name)
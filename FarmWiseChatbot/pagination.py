@@ -0,0 +1,53 @@
+import base64
+from datetime import datetime
+from sqlalchemy import tuple_
+
+def encode_cursor(created_at, row_id):
+    """Opaque cursor for a row's (created_at, id) position"""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor from encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        created_at, row_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (UnicodeDecodeError, ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def keyset_query(query, model, before=None):
+    """Order a query newest first and, given a cursor, keep only rows older than it"""
+    if before:
+        created_at, row_id = decode_cursor(before)
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+    return query.order_by(model.created_at.desc(), model.id.desc())
+
+def keyset_page(query, model, before=None, limit=20):
+    """
+    Newest-first page of a query, keyed on (created_at, id)
+
+    Rows are compared on the (created_at, id) pair, so each page is an index
+    range scan no matter how deep the user has scrolled, and rows written
+    in the same instant are neither skipped nor repeated.
+
+    Args:
+        query: Query already filtered to the rows to page through
+        model: Mapped class with created_at and id columns
+        before (str): Cursor of the oldest row already shown, or None for the first page
+        limit (int): Page size
+
+    Returns:
+        tuple: (rows newest first, cursor for the next older page or None)
+    """
+    rows = keyset_query(query, model, before).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
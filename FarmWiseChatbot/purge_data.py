@@ -0,0 +1,141 @@
+"""
+Retention purge for tables that only ever grow.
+
+Deletes expired OTPs (email_verification), password reset tokens, sent
+or dead-lettered outbox emails and "New Chat" chats that never got a
+message, each past its RETENTION_* setting. Rows are deleted oldest first
+in batches of PURGE_BATCH_SIZE, one short transaction per batch, so
+signups and chats are never blocked for long; on PostgreSQL a batch that
+would wait more than PURGE_LOCK_TIMEOUT_MS for a lock is left for the
+next run.
+
+Run it daily from cron (or a Render cron job), or keep it running with
+--every:
+
+Usage:
+    python purge_data.py [--dry-run] [--table NAME ...] [--every SECONDS]
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, exists, func, select, text
+from sqlalchemy.exc import OperationalError
+from app import app, db
+from models import Chat, Message
+from email_utils import EmailOutbox, EmailVerification, PasswordReset
+import metrics
+
+logger = logging.getLogger(__name__)
+
+TABLES = ['email_verification', 'password_reset', 'email_outbox', 'empty_chat']
+
+def retention_rules(now=None):
+    """
+    (table, model, condition) for each table with a retention period
+
+    Tables whose retention setting is 0 are left out.
+    """
+    now = now or datetime.utcnow()
+    config = app.config
+    rules = []
+
+    if config['RETENTION_EMAIL_VERIFICATION_DAYS'] > 0:
+        cutoff = now - timedelta(days=config['RETENTION_EMAIL_VERIFICATION_DAYS'])
+        rules.append(('email_verification', EmailVerification, EmailVerification.created_at < cutoff))
+
+    if config['RETENTION_PASSWORD_RESET_DAYS'] > 0:
+        cutoff = now - timedelta(days=config['RETENTION_PASSWORD_RESET_DAYS'])
+        rules.append(('password_reset', PasswordReset, PasswordReset.created_at < cutoff))
+
+    if config['RETENTION_EMAIL_OUTBOX_DAYS'] > 0:
+        cutoff = now - timedelta(days=config['RETENTION_EMAIL_OUTBOX_DAYS'])
+        rules.append(('email_outbox', EmailOutbox,
+                      and_(EmailOutbox.status.in_(['sent', 'dead']), EmailOutbox.created_at < cutoff)))
+
+    if config['RETENTION_EMPTY_CHAT_HOURS'] > 0:
+        cutoff = now - timedelta(hours=config['RETENTION_EMPTY_CHAT_HOURS'])
+        rules.append(('empty_chat', Chat,
+                      and_(Chat.title == "New Chat", Chat.created_at < cutoff,
+                           ~exists().where(Message.chat_id == Chat.id))))
+
+    return rules
+
+def _set_lock_timeout():
+    if db.session.get_bind().dialect.name == 'postgresql':
+        db.session.execute(text(f"SET LOCAL lock_timeout = {int(app.config['PURGE_LOCK_TIMEOUT_MS'])}"))
+
+def purge_table(name, model, condition, dry_run=False):
+    """
+    Delete the rows of one table matching its retention condition, in batches
+
+    The condition is checked again by each DELETE, so a row that changed
+    since it was selected (a chat that just got its first message) is kept.
+
+    Returns:
+        int: Rows deleted, or that would be deleted in a dry run
+    """
+    if dry_run:
+        return db.session.scalar(select(func.count()).select_from(model).where(condition))
+
+    batch_size = app.config['PURGE_BATCH_SIZE']
+    deleted = 0
+    while True:
+        try:
+            _set_lock_timeout()
+            # Oldest rows have the lowest ids, so the primary key finds them
+            ids = db.session.scalars(select(model.id).where(condition).order_by(model.id).limit(batch_size)).all()
+            if not ids:
+                db.session.rollback()
+                break
+
+            result = db.session.execute(delete(model).where(model.id.in_(ids), condition)
+                                        .execution_options(synchronize_session=False))
+            db.session.commit()
+        except OperationalError as e:
+            db.session.rollback()
+            logger.warning(f"Purge of {name} stopped after {deleted} rows, will resume next run: {str(e)}")
+            break
+
+        deleted += result.rowcount
+        if len(ids) < batch_size:
+            break
+        time.sleep(app.config['PURGE_BATCH_PAUSE'])
+
+    metrics.increment(f'purge.{name}', deleted)
+    return deleted
+
+def purge(tables=None, dry_run=False):
+    """
+    Apply every retention rule, or only those for the given tables
+
+    Returns:
+        dict: {table: rows deleted (or that would be)}
+    """
+    results = {}
+    with app.app_context():
+        for name, model, condition in retention_rules():
+            if tables and name not in tables:
+                continue
+            started = time.perf_counter()
+            results[name] = purge_table(name, model, condition, dry_run)
+            logger.info(f"{'Would delete' if dry_run else 'Deleted'} {results[name]} rows from {name} "
+                        f"in {time.perf_counter() - started:.1f}s")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Delete rows past their retention period')
+    parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would be deleted')
+    parser.add_argument('--table', action='append', choices=TABLES, help='Purge only this table (repeatable)')
+    parser.add_argument('--every', type=float, metavar='SECONDS', help='Keep running, purging at this interval')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    while True:
+        purge(args.table, args.dry_run)
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+if __name__ == '__main__':
+    main()
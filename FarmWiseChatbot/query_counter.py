@@ -0,0 +1,47 @@
+"""
+Database round trips per request.
+
+Every statement and commit sent on behalf of a request is counted. The
+/api/metrics counters db.round_trips.<endpoint> and db.requests.<endpoint>
+give the average per request. tests/test_db_round_trips.py holds the chat and sign-up
+routes to a budget.
+"""
+from flask import g, has_request_context, request
+from sqlalchemy import event
+import metrics
+
+def _count(*args, **kwargs):
+    if has_request_context():
+        g.db_round_trips = g.get('db_round_trips', 0) + 1
+
+def _count_commit(*args, **kwargs):
+    if has_request_context():
+        g.db_round_trips = g.get('db_round_trips', 0) + 1
+        g.db_commits = g.get('db_commits', 0) + 1
+
+def round_trips():
+    """Round trips made so far by the current request"""
+    return g.get('db_round_trips', 0)
+
+def commits():
+    """Commits made so far by the current request"""
+    return g.get('db_commits', 0)
+
+def install(app, engine):
+    """Count round trips on an engine and record them when each request ends"""
+    event.listen(engine, 'before_cursor_execute', _count)
+    event.listen(engine, 'commit', _count_commit)
+    event.listen(engine, 'rollback', _count)
+
+    # A streamed response tears the request down twice, once when the view
+    # returns and again when the stream ends, so only the round trips made
+    # since the last teardown are added
+    @app.teardown_request
+    def record_round_trips(exc):
+        if not request.endpoint:
+            return
+        total = round_trips()
+        if 'db_round_trips_recorded' not in g:
+            metrics.increment(f'db.requests.{request.endpoint}')
+        metrics.increment(f'db.round_trips.{request.endpoint}', total - g.get('db_round_trips_recorded', 0))
+        g.db_round_trips_recorded = total
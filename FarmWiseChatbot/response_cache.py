@@ -0,0 +1,303 @@
+"""
+Semantic cache of chat answers for repeated farmer questions.
+
+Questions are embedded locally and compared by cosine similarity with the
+answers already given to farmers in the same scope (language and the
+profile fields the prompt mentions), so "How do I control brown plant hopper in rice?" can reuse the
+answer to "how to control brown planthopper in rice". A hit needs the
+similarity to clear the embedder's threshold and the two questions to
+share the same content words (filler words aside, spacing ignored).
+Embeddings rank "brown planthopper in my rice field" close to "... wheat
+field" and "which pesticide is safe" close to "... is not safe", so the
+similarity alone never decides a hit: a different crop, input, number or
+a negation always misses.
+
+Embeddings come from sentence-transformers when it is installed (a small
+multilingual model on CPU), otherwise from hashed character n-grams, which
+only catch close rewordings and so use a stricter threshold.
+"""
+import re
+import threading
+import time
+import unicodedata
+import zlib
+import numpy as np
+from app import app
+import metrics
+
+# Words that don't change what is being asked
+FILLER_WORDS = {
+    'i', 'do', 'does', 'should', 'can', 'could', 'would', 'the', 'a', 'an', 'is', 'are', 'am', 'my', 'me',
+    'please', 'tell', 'to', 'in', 'of', 'for', 'on', 'at', 'kindly',
+    'की', 'का', 'के', 'में', 'है', 'हैं', 'करें', 'करना', 'करनी', 'चाहिए', 'मैं', 'मेरे', 'मुझे', 'कृपया', 'बताएं',
+}
+
+def normalize_query(text):
+    """Lowercase, strip punctuation and filler words"""
+    text = unicodedata.normalize('NFC', text).lower()
+    words = re.sub(r'[^\w\s.]|(?<!\d)\.|\.(?!\d)', ' ', text).split()
+    return ' '.join(word for word in words if word not in FILLER_WORDS)
+
+def same_content(query, other):
+    """
+    Whether two normalized questions use the same content words
+
+    Word order and spacing don't matter ("plant hopper" is "planthopper"),
+    but every word, negations and numbers included, has to be in both.
+    """
+    return sorted(query.split()) == sorted(other.split()) or query.replace(' ', '') == other.replace(' ', '')
+
+class EmbedderUnavailable(RuntimeError):
+    """Raised when an embedding backend's package or model is missing"""
+
+class HashingEmbedder:
+    """Character 3-5-gram and word counts hashed into a fixed-size vector; no model needed"""
+
+    name = 'hashing'
+    threshold = 0.88
+
+    def __init__(self, dimensions=2048):
+        self.dimensions = dimensions
+
+    def embed(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in text.split():
+            vector[zlib.crc32(f'w:{word}'.encode('utf-8')) % self.dimensions] += 1.0
+            padded = f' {word} '
+            for n in range(3, 6):
+                for i in range(len(padded) - n + 1):
+                    vector[zlib.crc32(padded[i:i + n].encode('utf-8')) % self.dimensions] += 1.0
+
+        vector = np.sqrt(vector)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+class SentenceTransformerEmbedder:
+    """Multilingual sentence embeddings on CPU via sentence-transformers"""
+
+    name = 'sentence-transformers'
+    threshold = 0.9
+
+    def __init__(self, model_name):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise EmbedderUnavailable("Needs the 'sentence-transformers' package (pip install sentence-transformers)")
+
+        self.model = SentenceTransformer(model_name, device='cpu')
+
+    def embed(self, text):
+        return self.model.encode(text, normalize_embeddings=True).astype(np.float32)
+
+def create_embedder(model_name):
+    """The sentence-transformers embedder if available, otherwise the hashing one"""
+    if model_name and model_name != 'hashing':
+        try:
+            return SentenceTransformerEmbedder(model_name)
+        except Exception as e:
+            app.logger.warning(f"Semantic cache falling back to hashed n-grams: {str(e)}")
+    return HashingEmbedder()
+
+class _Entry:
+    __slots__ = ('query', 'answer', 'generation_ms', 'expires_at', 'last_used')
+
+    def __init__(self, query, answer, generation_ms, expires_at):
+        self.query = query
+        self.answer = answer
+        self.generation_ms = generation_ms
+        self.expires_at = expires_at
+        self.last_used = time.monotonic()
+
+class _ScopeIndex:
+    """Vectors of one scope's cached questions, as rows of a matrix grown by doubling"""
+
+    def __init__(self, dimensions):
+        self.vectors = np.zeros((8, dimensions), dtype=np.float32)
+        self.entries = []
+
+    def add(self, vector, entry):
+        if len(self.entries) == len(self.vectors):
+            self.vectors = np.vstack([self.vectors, np.zeros_like(self.vectors)])
+        self.vectors[len(self.entries)] = vector
+        self.entries.append(entry)
+
+    def nearest(self, vector):
+        """(similarity, entry) pairs, best first"""
+        if not self.entries:
+            return []
+        similarities = self.vectors[:len(self.entries)] @ vector
+        order = np.argsort(-similarities)[:5]
+        return [(float(similarities[i]), self.entries[i]) for i in order]
+
+    def remove(self, entry):
+        self.keep(lambda candidate: candidate is not entry)
+
+    def keep(self, predicate):
+        kept = [i for i, entry in enumerate(self.entries) if predicate(entry)]
+        self.vectors = self.vectors[kept] if kept else np.zeros((8, self.vectors.shape[1]), dtype=np.float32)
+        self.entries = [self.entries[i] for i in kept]
+
+class SemanticCache:
+    """
+    Nearest-neighbour answer cache, partitioned by scope.
+
+    Each scope (language plus the profile fields that change the answer)
+    has its own vector matrix, so a lookup is one matrix-vector product over
+    that scope's questions. Entries expire after ttl; past max_entries the
+    least recently used tenth is evicted.
+    """
+
+    def __init__(self, embedder, ttl, max_entries, threshold=None):
+        self.embedder = embedder
+        self.threshold = threshold if threshold is not None else embedder.threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._scopes = {}
+        self._exact = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+
+    def lookup(self, question, scope):
+        """
+        Return a cached answer for a question that is close enough to one already answered
+
+        Returns:
+            tuple or None: (answer, similarity) on a hit
+        """
+        query = normalize_query(question)
+        with metrics.timer('semantic_cache.lookup'):
+            now = time.monotonic()
+            entry = self._exact.get((scope, query))
+            similarity = 1.0
+
+            if entry is None or entry.expires_at < now:
+                entry = None
+                vector = self.embedder.embed(query)
+                with self._lock:
+                    index = self._scopes.get(scope)
+                    candidates = index.nearest(vector) if index else []
+                for candidate_similarity, candidate in candidates:
+                    if candidate_similarity < self.threshold:
+                        break
+                    if candidate.expires_at >= now and same_content(query, candidate.query):
+                        entry, similarity = candidate, candidate_similarity
+                        break
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                metrics.increment('semantic_cache.miss')
+                return None
+
+            entry.last_used = now
+            self.hits += 1
+            self.saved_ms += entry.generation_ms
+            metrics.increment('semantic_cache.hit')
+            metrics.observe('semantic_cache.saved', entry.generation_ms)
+            return entry.answer, similarity
+
+    def store(self, question, scope, answer, generation_ms):
+        """Cache the answer to a question, with how long it took to generate"""
+        query = normalize_query(question)
+        if not query:
+            return
+
+        vector = self.embedder.embed(query)
+        now = time.monotonic()
+        entry = _Entry(query, answer, generation_ms, now + self.ttl)
+        with self._lock:
+            index = self._scopes.get(scope)
+            existing = self._exact.get((scope, query))
+            if existing is not None:
+                if existing.expires_at >= now:
+                    return
+                # Expired but not yet evicted: replace it, vector included
+                index.remove(existing)
+            if index is None:
+                index = self._scopes[scope] = _ScopeIndex(len(vector))
+            index.add(vector, entry)
+            self._exact[(scope, query)] = entry
+
+            if len(self._exact) > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        now = time.monotonic()
+        live = sorted((entry.last_used for entry in self._exact.values() if entry.expires_at >= now))
+        cutoff = live[len(live) // 10] if len(live) > self.max_entries * 0.9 else float('-inf')
+
+        def keep(entry):
+            return entry.expires_at >= now and entry.last_used > cutoff
+
+        for scope in list(self._scopes):
+            index = self._scopes[scope]
+            index.keep(keep)
+            if not index.entries:
+                del self._scopes[scope]
+        self._exact = {key: entry for key, entry in self._exact.items() if keep(entry)}
+        metrics.increment('semantic_cache.evictions')
+
+    def clear(self):
+        with self._lock:
+            self._scopes.clear()
+            self._exact.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'embedder': self.embedder.name,
+                'entries': len(self._exact),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'latency_saved_s': round(self.saved_ms / 1000, 1)
+            }
+
+def _normalize_field(value):
+    return ' '.join(str(value).lower().split()) if value else ''
+
+def cache_scope(user_profile, language):
+    """The answer language plus the profile fields that go into the chat prompt"""
+    if user_profile is None:
+        return (language,)
+    return (language, _normalize_field(user_profile.farm_location), _normalize_field(user_profile.soil_type),
+            user_profile.soil_ph, _normalize_field(user_profile.crops_grown))
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Return the process-wide semantic cache, or None when it is disabled"""
+    global _cache
+    if not app.config['SEMANTIC_CACHE_ENABLED']:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticCache(create_embedder(app.config['SEMANTIC_CACHE_MODEL']),
+                                       app.config['SEMANTIC_CACHE_TTL'],
+                                       app.config['SEMANTIC_CACHE_MAX_ENTRIES'],
+                                       app.config['SEMANTIC_CACHE_THRESHOLD'])
+    return _cache
+
+def lookup(question, user_profile, language):
+    """Cached answer for a question, or None"""
+    cache = get_cache()
+    if cache is None:
+        return None
+    hit = cache.lookup(question, cache_scope(user_profile, language))
+    return hit[0] if hit else None
+
+def store(question, user_profile, language, answer, generation_ms):
+    """Remember a freshly generated answer"""
+    cache = get_cache()
+    if cache is not None:
+        cache.store(question, cache_scope(user_profile, language), answer, generation_ms)
+
+def stats():
+    """Hit rate and latency saved for /api/metrics"""
+    return _cache.stats() if _cache is not None else {'entries': 0, 'hits': 0, 'misses': 0,
+                                                      'hit_rate': 0.0, 'latency_saved_s': 0.0}
@@ -1,14 +1,34 @@
+import hmac
 import json
-from flask import render_template, redirect, url_for, flash, request, jsonify, session
+import time
+from datetime import datetime
+from flask import (
+    render_template, redirect, url_for, flash, request, jsonify, session,
+    Response, stream_with_context, send_file, abort
+)
 from flask_login import login_user, logout_user, login_required, current_user
+from sqlalchemy.exc import IntegrityError
 from werkzeug.security import generate_password_hash
 from app import app, db
 from models import User, Chat, Message, UserProfile
-from chatbot import get_chatbot_response, get_crop_recommendations, get_youtube_videos
-from utils import get_weather_data, translate_text, text_to_speech, speech_to_text
+import catalog
+import conversation
+from chat_history import chat_list_page, message_page, save_exchange, serialize_chat, serialize_message
+import mailer
+import metrics
+import user_context
+from chatbot import (
+    CHAT_ERROR_MESSAGE, get_chatbot_response, stream_chatbot_response,
+    get_crop_recommendations, get_youtube_videos, describe_crop_shortlist
+)
+from utils import (
+    get_weather_data, get_cached_weather_data, translate_text, translate_batch,
+    text_to_speech, text_to_speech_key, text_to_speech_chunks, get_audio_path,
+    speech_to_text, speech_to_text_stream, AudioInputError
+)
 from email_utils import (
-    generate_otp, generate_reset_token, send_verification_email,
-    send_password_reset_email, verify_otp, verify_reset_token,
+    generate_otp, generate_reset_token, queue_verification_email,
+    queue_password_reset_email, verify_otp, verify_reset_token,
     EmailVerification, PasswordReset
 )
 
@@ -34,6 +54,8 @@ def login():
                 return redirect(url_for('verify_email', email=email))
             
             login_user(user)
+            # Warm the user's context so the pages after login don't query it
+            user_context.get(user.id)
             next_page = request.args.get('next')
             return redirect(next_page or url_for('dashboard'))
         else:
@@ -59,26 +81,9 @@ def register():
             flash('Passwords do not match', 'danger')
             return render_template('register.html')
         
-        # Check for existing username
-        existing_username = User.query.filter_by(username=username).first()
-        if existing_username:
-            flash('Username already taken. Please choose a different username.', 'danger')
-            return render_template('register.html')
-        
-        # Check for existing email
-        existing_email = User.query.filter_by(email=email).first()
-        if existing_email:
-            flash('Email already registered. Please use a different email or login.', 'danger')
-            return render_template('register.html')
-        
         try:
-            # Generate OTP first
             otp = generate_otp()
             
-            # Try sending the email first before creating any database records
-            send_verification_email(email, otp)
-            
-            # If email sends successfully, then create user and verification records
             new_user = User(
                 username=username,
                 email=email,
@@ -87,38 +92,35 @@ def register():
                 is_email_verified=False
             )
             new_user.set_password(password)
+            new_user.profile = UserProfile()
+            
+            # User, profile, OTP and the queued email commit together; the
+            # email worker sends it, so signup doesn't wait on SMTP
+            db.session.add(new_user)
+            db.session.add(EmailVerification(email=email, otp=otp))
+            queue_verification_email(email, otp)
+            db.session.commit()
             
-            verification = EmailVerification(email=email, otp=otp)
+            flash('Registration successful. Please check your email for verification code.', 'success')
+            return redirect(url_for('verify_email', email=email))
             
-            # Start database transaction
-            db.session.begin_nested()
-            try:
-                db.session.add(new_user)
-                db.session.add(verification)
-                db.session.commit()
-                
-                # Create user profile
-                profile = UserProfile(user_id=new_user.id)
-                db.session.add(profile)
-                db.session.commit()
-                
-                flash('Registration successful. Please check your email for verification code.', 'success')
-                return redirect(url_for('verify_email', email=email))
-                
-            except Exception as db_error:
-                db.session.rollback()
-                flash('Database error occurred. Please try again.', 'danger')
-                print(f"Database error: {str(db_error)}")
-                return render_template('register.html')
-                
-        except Exception as email_error:
-            flash('Failed to send verification email. Please try again or contact support.', 'danger')
-            print(f"Email error: {str(email_error)}")
+        except IntegrityError:
+            # Username and email are unique, so which one is taken is only
+            # looked up when the insert is refused
+            db.session.rollback()
+            if User.query.filter_by(username=username).first():
+                flash('Username already taken. Please choose a different username.', 'danger')
+            else:
+                flash('Email already registered. Please use a different email or login.', 'danger')
+            return render_template('register.html')
+            
+        except Exception as db_error:
+            db.session.rollback()
+            flash('Database error occurred. Please try again.', 'danger')
+            print(f"Database error: {str(db_error)}")
             return render_template('register.html')
     
-    # Load available languages
-    with open('static/data/languages.json', 'r', encoding='utf-8') as f:
-        languages = json.load(f)
+    languages = catalog.get_languages()
     
     return render_template('register.html', languages=languages)
 
@@ -128,8 +130,7 @@ def verify_email(email):
         otp = request.form.get('otp')
         
         if verify_otp(email, otp):
-            user = User.query.filter_by(email=email).first()
-            user.is_email_verified = True
+            User.query.filter_by(email=email).update({'is_email_verified': True}, synchronize_session=False)
             db.session.commit()
             
             flash('Email verified successfully. Please login.', 'success')
@@ -151,17 +152,14 @@ def resend_otp(email):
         flash('Email already verified.', 'info')
         return redirect(url_for('login'))
     
-    # Generate and send new OTP
+    # Generate a new OTP and queue it for sending
     otp = generate_otp()
     verification = EmailVerification(email=email, otp=otp)
     db.session.add(verification)
+    queue_verification_email(email, otp)
     db.session.commit()
     
-    try:
-        send_verification_email(email, otp)
-        flash('New verification code sent. Please check your email.', 'success')
-    except Exception as e:
-        flash('Failed to send verification email. Please try again.', 'danger')
+    flash('New verification code sent. Please check your email.', 'success')
     
     return redirect(url_for('verify_email', email=email))
 
@@ -175,14 +173,11 @@ def forgot_password():
             token = generate_reset_token()
             reset = PasswordReset(email=email, token=token)
             db.session.add(reset)
+            queue_password_reset_email(email, token)
             db.session.commit()
             
-            try:
-                send_password_reset_email(email, token)
-                flash('Password reset instructions sent to your email.', 'success')
-                return redirect(url_for('login'))
-            except Exception as e:
-                flash('Failed to send reset email. Please try again.', 'danger')
+            flash('Password reset instructions sent to your email.', 'success')
+            return redirect(url_for('login'))
         else:
             flash('Email not found.', 'danger')
     
@@ -204,13 +199,13 @@ def reset_password(token):
             flash('Passwords do not match.', 'danger')
             return render_template('reset_password.html', token=token)
         
-        user = User.query.filter_by(email=email).first()
-        user.set_password(password)
+        User.query.filter_by(email=email).update(
+            {'password_hash': generate_password_hash(password)}, synchronize_session=False)
         
         # Mark reset token as used
-        reset = PasswordReset.query.filter_by(token=token).first()
-        reset.is_used = True
+        PasswordReset.query.filter_by(token=token).update({'is_used': True}, synchronize_session=False)
         db.session.commit()
+        user_context.invalidate_email(email)
         
         flash('Password reset successful. Please login with your new password.', 'success')
         return redirect(url_for('login'))
@@ -227,22 +222,37 @@ def logout():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    # Get user's chats
-    chats = Chat.query.filter_by(user_id=current_user.id).order_by(Chat.created_at.desc()).all()
+    # First page of the user's chats; older ones load as the list is scrolled
+    chats, chat_previews, chats_cursor = chat_list_page(current_user.id, limit=app.config['CHAT_LIST_PAGE_SIZE'])
     
     # Get user profile
-    profile = UserProfile.query.filter_by(user_id=current_user.id).first()
+    profile = user_context.get(current_user.id).profile
     
-    # Get weather data for user's location if available
-    weather_data = None
-    if current_user.location:
-        weather_data = get_weather_data(current_user.location)
+    # Only use weather that is already cached; otherwise the page loads it from
+    # /api/weather so rendering never waits on WeatherAPI
+    weather_data = get_cached_weather_data(current_user.location)
     
     return render_template('dashboard.html', 
                            chats=chats, 
+                           chat_previews=chat_previews,
+                           chats_cursor=chats_cursor,
                            profile=profile, 
                            weather_data=weather_data)
 
+@app.route('/api/weather')
+@login_required
+def api_weather():
+    # Only the user's own farm: an arbitrary ?location= would spend WeatherAPI quota on any place
+    location = current_user.location
+    if not location:
+        return jsonify({'error': 'No location set'}), 404
+    
+    weather_data = get_weather_data(location)
+    if weather_data is None:
+        return jsonify({'error': 'Weather data unavailable'}), 503
+    
+    return jsonify({'weather': weather_data})
+
 @app.route('/chat/<int:chat_id>')
 @login_required
 def chat(chat_id):
@@ -253,13 +263,48 @@ def chat(chat_id):
         flash('You do not have permission to view this chat', 'danger')
         return redirect(url_for('dashboard'))
     
-    messages = Message.query.filter_by(chat_id=chat.id).order_by(Message.created_at).all()
+    # Only the latest messages and chats are rendered; chat.js fetches older pages on scroll
+    messages, messages_cursor = message_page(chat.id, limit=app.config['CHAT_MESSAGES_PAGE_SIZE'])
+    chats, _, chats_cursor = chat_list_page(current_user.id, limit=app.config['CHAT_LIST_PAGE_SIZE'],
+                                          with_previews=False)
     
-    # Load available languages
-    with open('static/data/languages.json', 'r', encoding='utf-8') as f:
-        languages = json.load(f)
+    languages = catalog.get_languages()
     
-    return render_template('chat.html', chat=chat, messages=messages, languages=languages)
+    return render_template('chat.html', chat=chat, messages=messages, messages_cursor=messages_cursor,
+                           chats=chats, chats_cursor=chats_cursor, languages=languages)
+
+@app.route('/api/chat/<int:chat_id>/messages')
+@login_required
+def api_chat_messages(chat_id):
+    chat = Chat.query.get_or_404(chat_id)
+    if chat.user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    limit = min(request.args.get('limit', app.config['CHAT_MESSAGES_PAGE_SIZE'], type=int), app.config['PAGE_SIZE_MAX'])
+    try:
+        messages, next_cursor = message_page(chat.id, request.args.get('before'), max(limit, 1))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'messages': [serialize_message(message) for message in messages],
+        'next_cursor': next_cursor
+    })
+
+@app.route('/api/chats')
+@login_required
+def api_chats():
+    limit = min(request.args.get('limit', app.config['CHAT_LIST_PAGE_SIZE'], type=int), app.config['PAGE_SIZE_MAX'])
+    try:
+        chats, previews, next_cursor = chat_list_page(current_user.id, request.args.get('before'), max(limit, 1),
+                                                      with_previews=request.args.get('previews', 'true') == 'true')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'chats': [serialize_chat(chat, previews.get(chat.id)) for chat in chats],
+        'next_cursor': next_cursor
+    })
 
 @app.route('/chat/new')
 @login_required
@@ -273,6 +318,7 @@ def new_chat():
 @app.route('/api/send_message', methods=['POST'])
 @login_required
 def send_message():
+    asked_at = datetime.utcnow()
     data = request.json
     chat_id = data.get('chat_id')
     message_content = data.get('message')
@@ -283,34 +329,125 @@ def send_message():
     if chat.user_id != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    # Save user message
-    user_message = Message(chat_id=chat_id, content=message_content, is_user=True)
-    db.session.add(user_message)
-    db.session.commit()
+    # Profile and its prompt context, cached per user
+    context = user_context.get(current_user.id)
+    profile = context.profile
     
-    # Get user profile for context
-    profile = UserProfile.query.filter_by(user_id=current_user.id).first()
+    # Earlier turns of this chat, within the history token budget
+    history = conversation.build_history(chat)
     
-    # Get response from chatbot
-    response = get_chatbot_response(message_content, profile, language)
+    # Standalone questions can be answered from the semantic cache; follow-ups
+    # depend on the conversation so always go to the model
+    import response_cache
+    response = response_cache.lookup(message_content, profile, language) if not history else None
+    if response is None:
+        started = time.perf_counter()
+        response = get_chatbot_response(message_content, profile, language, history, context.prompt_context)
+        if not history and response != CHAT_ERROR_MESSAGE:
+            response_cache.store(message_content, profile, language, response,
+                                 (time.perf_counter() - started) * 1000)
     
-    # Save bot response
-    bot_message = Message(chat_id=chat_id, content=response, is_user=False)
-    db.session.add(bot_message)
-    db.session.commit()
+    # Save the question, the reply and a new chat's title in one commit
+    bot_message_id = save_exchange(chat_id, message_content, response, asked_at, rename=chat.title == "New Chat")
     
-    # Update chat title if it's a new chat
-    if chat.title == "New Chat":
-        # Extract a title from the first user message
-        title = message_content[:50] + "..." if len(message_content) > 50 else message_content
-        chat.title = title
-        db.session.commit()
+    # Fold turns that have left the window into the chat's summary
+    conversation.schedule_summary_update(chat_id)
     
     return jsonify({
         'response': response,
-        'message_id': bot_message.id
+        'message_id': bot_message_id
     })
 
+@app.route('/api/send_message_stream', methods=['POST'])
+@login_required
+def send_message_stream():
+    """Stream the bot reply as Server-Sent Events, saving the exchange once complete"""
+    started = time.perf_counter()
+    asked_at = datetime.utcnow()
+    data = request.json
+    chat_id = data.get('chat_id')
+    message_content = data.get('message')
+    language = data.get('language', current_user.preferred_language)
+    
+    # Validate chat ownership
+    chat = Chat.query.get_or_404(chat_id)
+    if chat.user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    rename = chat.title == "New Chat"
+    
+    # Profile and its prompt context, cached per user
+    context = user_context.get(current_user.id)
+    profile = context.profile
+    
+    # Earlier turns of this chat, within the history token budget
+    history = conversation.build_history(chat)
+    
+    # Standalone questions can be answered from the semantic cache; follow-ups
+    # depend on the conversation so always go to the model
+    import response_cache
+    cached = response_cache.lookup(message_content, profile, language) if not history else None
+    
+    # Set once the exchange is saved; until then closing the response saves the question
+    saved = False
+    
+    def generate():
+        nonlocal saved
+        chunks = []
+        generation_started = time.perf_counter()
+        if cached is not None:
+            source = [cached]
+        else:
+            source = stream_chatbot_response(message_content, profile, language, history, context.prompt_context)
+        for chunk in source:
+            # Cache hits would pull the model's time to first token down
+            if not chunks and cached is None:
+                ttft_ms = (time.perf_counter() - started) * 1000
+                metrics.observe('send_message.time_to_first_token', ttft_ms)
+                app.logger.info(f"Chat {chat_id} time to first token: {ttft_ms:.0f} ms")
+            chunks.append(chunk)
+            yield f"data: {json.dumps({'delta': chunk})}\n\n"
+        
+        response = ''.join(chunks)
+        if cached is None and not history and CHAT_ERROR_MESSAGE not in response:
+            response_cache.store(message_content, profile, language, response,
+                                 (time.perf_counter() - generation_started) * 1000)
+        
+        # Save the question, the reply and a new chat's title in one commit
+        bot_message_id = save_exchange(chat_id, message_content, response, asked_at, rename=rename)
+        saved = True
+        conversation.schedule_summary_update(chat_id)
+        
+        metrics.observe('send_message.total', (time.perf_counter() - started) * 1000)
+        yield f"event: done\ndata: {json.dumps({'message_id': bot_message_id})}\n\n"
+    
+    def save_abandoned_question():
+        # The client went away before the answer was complete, possibly before
+        # the generator even started; keep its question
+        if not saved:
+            with app.app_context():
+                save_exchange(chat_id, message_content, None, asked_at, rename=rename)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(save_abandoned_question)
+    return response
+
+@app.route('/api/metrics')
+def api_metrics():
+    # For operators, not farmers: only served to callers holding METRICS_TOKEN
+    token = app.config['METRICS_TOKEN']
+    if not token:
+        abort(404)
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not hmac.compare_digest(supplied.encode(), token.encode()):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    snapshot = metrics.snapshot()
+    snapshot['mailer'] = mailer.stats()
+    import response_cache
+    snapshot['semantic_cache'] = response_cache.stats()
+    return jsonify(snapshot)
+
 @app.route('/api/delete_chat/<int:chat_id>', methods=['DELETE'])
 @login_required
 def delete_chat(chat_id):
@@ -341,11 +478,41 @@ def api_get_crop_recommendations():
     soil_ph = data.get('soil_ph')
     location = data.get('location', current_user.location)
     language = data.get('language', current_user.preferred_language)
+    temperature = data.get('temperature')
     
-    recommendations = get_crop_recommendations(soil_type, soil_ph, location, language)
+    recommendations = get_crop_recommendations(soil_type, soil_ph, location, language, temperature)
     
     return jsonify({'recommendations': recommendations})
 
+@app.route('/api/bulk_crop_recommendations', methods=['POST'])
+@login_required
+def api_bulk_crop_recommendations():
+    """Score many plots at once; accepts JSON or CSV and streams NDJSON back"""
+    from bulk_recommendations import read_plots, generate_ndjson
+    
+    # Reject oversized bodies before reading and parsing them
+    max_bytes = app.config['BULK_MAX_BYTES']
+    if request.content_length is None:
+        return jsonify({'error': 'Content-Length required'}), 411
+    if request.content_length > max_bytes:
+        return jsonify({'error': f'Plot data larger than {max_bytes} bytes'}), 413
+    
+    try:
+        plots = read_plots(request.get_data(as_text=True), request.content_type or 'application/json')
+    except ValueError:
+        return jsonify({'error': 'Invalid plot data'}), 400
+    
+    if len(plots) > app.config['BULK_MAX_PLOTS']:
+        return jsonify({'error': f"At most {app.config['BULK_MAX_PLOTS']} plots per request"}), 413
+    
+    language = request.args.get('language', current_user.preferred_language)
+    narrate = None
+    if request.args.get('narratives', 'false').lower() == 'true':
+        narrate = lambda crop_names: describe_crop_shortlist(crop_names, language)
+    
+    return Response(stream_with_context(generate_ndjson(plots, narrate, request.args.get('season'))),
+                    mimetype='application/x-ndjson')
+
 @app.route('/api/get_youtube_videos', methods=['POST'])
 @login_required
 def api_get_youtube_videos():
@@ -361,9 +528,23 @@ def api_get_youtube_videos():
 @login_required
 def api_translate():
     data = request.json
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
     text = data.get('text')
+    texts = data.get('texts')
     target_language = data.get('language')
     
+    # Accept a list of strings and translate them in a single model call
+    if texts is None and isinstance(text, list):
+        texts = text
+    if texts is not None:
+        if not isinstance(texts, list) or not all(isinstance(item, str) for item in texts):
+            return jsonify({'error': 'texts must be a list of strings'}), 400
+        return jsonify({'translated_texts': translate_batch(texts, target_language)})
+    
+    if text is not None and not isinstance(text, str):
+        return jsonify({'error': 'text must be a string'}), 400
+    
     translated_text = translate_text(text, target_language)
     
     return jsonify({'translated_text': translated_text})
@@ -375,9 +556,48 @@ def api_text_to_speech():
     text = data.get('text')
     language = data.get('language', current_user.preferred_language)
     
-    audio_base64 = text_to_speech(text, language)
+    # Clients that still expect inline base64 audio can ask for it
+    if data.get('inline'):
+        return jsonify({'audio_data': text_to_speech(text, language)})
+    
+    key = text_to_speech_key(text, language)
+    if key is None:
+        return jsonify({'audio_url': None})
+    
+    return jsonify({'audio_url': url_for('tts_audio', key=key)})
+
+@app.route('/api/text_to_speech_stream', methods=['POST'])
+@login_required
+def api_text_to_speech_stream():
+    """Synthesize long text sentence by sentence, streaming each chunk's audio URL as NDJSON"""
+    data = request.json
+    text = data.get('text') or ''
+    language = data.get('language', current_user.preferred_language)
+    
+    def generate():
+        for index, key in enumerate(text_to_speech_chunks(text, language)):
+            if key is None:
+                # Failed or timed out; the client skips this sentence
+                yield json.dumps({'index': index, 'audio_url': None, 'error': 'Speech synthesis failed'}) + '\n'
+                continue
+            yield json.dumps({'index': index, 'audio_url': url_for('tts_audio', key=key)}) + '\n'
     
-    return jsonify({'audio_data': audio_base64})
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/audio/<key>.mp3')
+@login_required
+def tts_audio(key):
+    """Serve cached speech as audio/mpeg; the URL is content-addressed so it never changes"""
+    path = get_audio_path(key)
+    if path is None:
+        return jsonify({'error': 'Audio not found'}), 404
+    
+    response = send_file(path, mimetype='audio/mpeg', etag=key, conditional=True,
+                         max_age=app.config['TTS_AUDIO_MAX_AGE'])
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    return response
 
 @app.route('/api/speech_to_text', methods=['POST'])
 @login_required
@@ -390,17 +610,49 @@ def api_speech_to_text():
     
     return jsonify({'text': text})
 
+@app.route('/api/speech_to_text_upload', methods=['POST'])
+@login_required
+def api_speech_to_text_upload():
+    """Recognize speech from a raw audio body or a multipart 'audio' file, without base64"""
+    language = request.args.get('language', current_user.preferred_language)
+    
+    # Reject oversized uploads before reading the body
+    max_bytes = app.config['STT_MAX_UPLOAD_BYTES']
+    if request.content_length is None:
+        return jsonify({'error': 'Content-Length required'}), 411
+    if request.content_length > max_bytes:
+        return jsonify({'error': f'Audio larger than {max_bytes} bytes'}), 413
+    
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('audio')
+        if upload is None:
+            return jsonify({'error': 'No audio file'}), 400
+        stream, content_type = upload.stream, upload.mimetype
+    else:
+        stream, content_type = request.stream, request.mimetype
+    
+    try:
+        text = speech_to_text_stream(stream, content_type, language)
+    except AudioInputError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        app.logger.error(f"Speech-to-text error: {str(e)}")
+        text = ""
+    
+    return jsonify({'text': text})
+
 @app.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
     profile = UserProfile.query.filter_by(user_id=current_user.id).first()
     
     if request.method == 'POST':
-        # Update user information
-        current_user.username = request.form.get('username')
-        current_user.email = request.form.get('email')
-        current_user.location = request.form.get('location')
-        current_user.preferred_language = request.form.get('language')
+        # Update user information (current_user is the cached, read-only copy)
+        user = db.session.get(User, current_user.id)
+        user.username = request.form.get('username')
+        user.email = request.form.get('email')
+        user.location = request.form.get('location')
+        user.preferred_language = request.form.get('language')
         
         # Update profile information
         profile.soil_type = request.form.get('soil_type')
@@ -410,11 +662,10 @@ def profile():
         profile.crops_grown = request.form.get('crops_grown')
         
         db.session.commit()
+        user_context.invalidate(current_user.id)
         flash('Profile updated successfully', 'success')
         return redirect(url_for('profile'))
     
-    # Load available languages
-    with open('static/data/languages.json', 'r', encoding='utf-8') as f:
-        languages = json.load(f)
+    languages = catalog.get_languages()
     
     return render_template('profile.html', profile=profile, languages=languages)
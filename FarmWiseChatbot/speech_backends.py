@@ -0,0 +1,168 @@
+import os
+import threading
+import metrics
+
+# Map language codes to Google speech recognition language codes
+GOOGLE_LANGUAGE_MAP = {
+    'en': 'en-US',
+    'hi': 'hi-IN',
+    'ta': 'ta-IN',
+    'te': 'te-IN',
+    'ml': 'ml-IN',
+    'kn': 'kn-IN',
+    'bn': 'bn-IN',
+    'gu': 'gu-IN',
+    'mr': 'mr-IN',
+    'pa': 'pa-IN'
+}
+
+SAMPLE_RATE = 16000
+
+class BackendUnavailable(RuntimeError):
+    """Raised when a backend can't serve a language (missing package or model)"""
+
+class GoogleBackend:
+    """Google Web Speech API; needs network access"""
+
+    name = 'google'
+
+    def recognize(self, audio, language='en'):
+        import speech_recognition as sr
+        recognizer = sr.Recognizer()
+        try:
+            return recognizer.recognize_google(audio, language=GOOGLE_LANGUAGE_MAP.get(language, 'en-US'))
+        except sr.UnknownValueError:
+            return ""
+
+class VoskBackend:
+    """
+    Offline Kaldi models via Vosk, one model directory per language:
+    <model_dir>/<language code>/ (e.g. models/vosk/hi from vosk-model-small-hi).
+    Models are loaded on first use and kept for the life of the worker.
+    """
+
+    name = 'vosk'
+
+    def __init__(self, model_dir):
+        try:
+            import vosk
+        except ImportError:
+            raise BackendUnavailable("Vosk backend needs the 'vosk' package (pip install vosk)")
+
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self.model_dir = model_dir
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def load(self, language):
+        model = self._models.get(language)
+        if model is not None:
+            return model
+
+        with self._lock:
+            if language not in self._models:
+                path = os.path.join(self.model_dir, language)
+                if not os.path.isdir(path):
+                    raise BackendUnavailable(f"No Vosk model for '{language}' in {self.model_dir}")
+                self._models[language] = self._vosk.Model(path)
+            return self._models[language]
+
+    def recognize(self, audio, language='en'):
+        import json
+
+        recognizer = self._vosk.KaldiRecognizer(self.load(language), SAMPLE_RATE)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2))
+        return json.loads(recognizer.FinalResult()).get('text', '')
+
+class WhisperBackend:
+    """
+    Offline multilingual Whisper on CPU via faster-whisper (CTranslate2, int8).
+    One model covers all ten languages; it is loaded once per worker.
+    """
+
+    name = 'whisper'
+
+    def __init__(self, model_size='small', threads=0):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise BackendUnavailable("Whisper backend needs the 'faster-whisper' package (pip install faster-whisper)")
+
+        self._model_class = WhisperModel
+        self.model_size = model_size
+        self.threads = threads
+        self._model = None
+        self._lock = threading.Lock()
+
+    def load(self, language=None):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._model_class(self.model_size, device='cpu', compute_type='int8',
+                                                    cpu_threads=self.threads)
+        return self._model
+
+    def recognize(self, audio, language='en'):
+        import numpy as np
+
+        pcm = audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2)
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        segments, _ = self.load().transcribe(samples, language=language, beam_size=1)
+        return ' '.join(segment.text.strip() for segment in segments).strip()
+
+def create_backend(name, config):
+    """Build a backend by name from a config mapping"""
+    if name == 'google':
+        return GoogleBackend()
+    if name == 'vosk':
+        return VoskBackend(config.get('STT_VOSK_MODEL_DIR', 'models/vosk'))
+    if name == 'whisper':
+        return WhisperBackend(config.get('STT_WHISPER_MODEL', 'small'), config.get('STT_WHISPER_THREADS', 0))
+    raise ValueError(f"Unknown speech backend: {name}")
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+def get_backend(name):
+    """Return the worker's shared backend instance for a name"""
+    backend = _backends.get(name)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(name)
+            if backend is None:
+                from app import app
+                backend = _backends[name] = create_backend(name, app.config)
+    return backend
+
+def recognize(audio, language='en'):
+    """
+    Recognize speech with the configured backend, trying the fallback backend
+    when the primary one is unreachable or can't serve the language
+    """
+    from app import app
+    import speech_recognition as sr
+
+    primary = app.config['STT_BACKEND']
+    fallback = app.config.get('STT_FALLBACK_BACKEND')
+
+    try:
+        with metrics.timer(f'speech.{primary}'):
+            return get_backend(primary).recognize(audio, language)
+    except (sr.RequestError, BackendUnavailable) as e:
+        if not fallback or fallback == primary:
+            raise
+        app.logger.warning(f"Speech backend '{primary}' failed ({str(e)}), using '{fallback}'")
+        metrics.increment('speech.fallback')
+        return get_backend(fallback).recognize(audio, language)
+
+def warm_up(names, languages):
+    """Load backends and their models up front so the first voice query isn't slow"""
+    for name in names:
+        backend = get_backend(name)
+        if hasattr(backend, 'load'):
+            for language in languages:
+                try:
+                    backend.load(language)
+                except BackendUnavailable:
+                    pass
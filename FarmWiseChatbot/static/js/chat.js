@@ -11,13 +11,26 @@ document.addEventListener('DOMContentLoaded', function() {
     const clearChatButton = document.getElementById('clear-chat');
     const exportChatButton = document.getElementById('export-chat');
     const audioPlayer = document.getElementById('audio-player');
+    const chatList = document.getElementById('chat-list');
     
     let autoPlayAudio = false;
     let currentLanguage = languageSelect.value;
+    let loadingOlder = false;
     
     // Initialize chat - scroll to bottom
     scrollToBottom();
     
+    // Only the latest messages are rendered; older pages load when scrolling up
+    chatContainer.addEventListener('scroll', function() {
+        if (chatContainer.scrollTop < 100) {
+            loadOlderMessages();
+        }
+    });
+    fillChatContainer();
+    
+    // Older chats in the sidebar load as it is scrolled
+    setupChatListPaging(chatList, renderChatListItem, false);
+    
     // Event listeners
     messageForm.addEventListener('submit', sendMessage);
     languageSelect.addEventListener('change', changeLanguage);
@@ -44,6 +57,15 @@ document.addEventListener('DOMContentLoaded', function() {
         typingIndicator.style.display = 'block';
         scrollToBottom();
         
+        // Stream the response when the browser can read response bodies incrementally
+        if (window.ReadableStream && window.TextDecoder) {
+            streamMessage(message);
+        } else {
+            sendMessageJson(message);
+        }
+    }
+    
+    function sendMessageJson(message) {
         // Send message to server
         fetch('/api/send_message', {
             method: 'POST',
@@ -76,6 +98,88 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    function streamMessage(message) {
+        let botMessageDiv = null;
+        let responseText = '';
+        let buffer = '';
+        
+        // Handle one Server-Sent Event from the stream
+        function handleEvent(rawEvent) {
+            let eventName = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    eventName = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data += line.slice(5).trim();
+                }
+            });
+            if (!data) return;
+            
+            const payload = JSON.parse(data);
+            if (eventName === 'done') {
+                if (botMessageDiv) {
+                    attachPlayButton(botMessageDiv, payload.message_id);
+                }
+                if (autoPlayAudio) {
+                    playMessageAudio(payload.message_id);
+                }
+                return;
+            }
+            
+            responseText += payload.delta;
+            if (!botMessageDiv) {
+                typingIndicator.style.display = 'none';
+                botMessageDiv = addMessageToUI(responseText, false);
+            } else {
+                botMessageDiv.querySelector('.markdown-content').innerHTML = processMarkdown(responseText);
+                scrollToBottom();
+            }
+        }
+        
+        fetch('/api/send_message_stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                chat_id: chatId,
+                message: message,
+                language: currentLanguage
+            })
+        })
+        .then(response => {
+            if (!response.ok || !response.body) {
+                throw new Error('Streaming request failed');
+            }
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            
+            function read() {
+                return reader.read().then(({ done, value }) => {
+                    if (done) {
+                        if (buffer.trim()) handleEvent(buffer);
+                        return;
+                    }
+                    
+                    buffer += decoder.decode(value, { stream: true });
+                    const events = buffer.split('\n\n');
+                    buffer = events.pop();
+                    events.forEach(handleEvent);
+                    return read();
+                });
+            }
+            
+            return read();
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            typingIndicator.style.display = 'none';
+            showNotification('There was an error sending your message. Please try again.', 'danger');
+        });
+    }
+    
     function addMessageToUI(content, isUser, messageId = null) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${isUser ? 'message-user' : 'message-bot'}`;
@@ -115,6 +219,93 @@ document.addEventListener('DOMContentLoaded', function() {
                 });
             });
         }
+        
+        return messageDiv;
+    }
+    
+    function attachPlayButton(messageDiv, messageId) {
+        const button = document.createElement('button');
+        button.className = 'btn btn-sm btn-link text-light p-0 ms-2 play-message';
+        button.setAttribute('data-message-id', messageId);
+        button.innerHTML = '<i class="fas fa-volume-up"></i>';
+        button.addEventListener('click', function() {
+            playMessageAudio(messageId);
+        });
+        messageDiv.querySelector('.message-time').appendChild(button);
+    }
+    
+    function loadOlderMessages() {
+        const cursor = chatContainer.dataset.nextCursor;
+        if (!cursor || loadingOlder) return;
+        loadingOlder = true;
+        
+        fetch(`/api/chat/${chatId}/messages?before=${encodeURIComponent(cursor)}`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Failed to load messages');
+            }
+            return response.json();
+        })
+        .then(data => {
+            // Keep the messages in view where they are while older ones go in above them
+            const previousHeight = chatContainer.scrollHeight;
+            const fragment = document.createDocumentFragment();
+            data.messages.forEach(message => fragment.appendChild(createHistoryMessage(message)));
+            chatContainer.insertBefore(fragment, chatContainer.firstChild);
+            chatContainer.scrollTop += chatContainer.scrollHeight - previousHeight;
+            
+            chatContainer.dataset.nextCursor = data.next_cursor || '';
+            loadingOlder = false;
+            fillChatContainer();
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            loadingOlder = false;
+        });
+    }
+    
+    // Without a scrollbar there is no way to scroll up, so keep loading until there is one
+    function fillChatContainer() {
+        if (chatContainer.scrollHeight <= chatContainer.clientHeight) {
+            loadOlderMessages();
+        }
+    }
+    
+    // Same markup as the server-rendered history in chat.html
+    function createHistoryMessage(message) {
+        const messageDiv = document.createElement('div');
+        messageDiv.className = `message ${message.is_user ? 'message-user' : 'message-bot'}`;
+        messageDiv.innerHTML = `
+            <div class="message-content">
+                ${message.is_user ? escapeHtml(message.content) : `<div class="markdown-content">${message.content}</div>`}
+            </div>
+            <div class="message-time">${message.time}</div>
+        `;
+        
+        if (!message.is_user) {
+            attachPlayButton(messageDiv, message.id);
+        }
+        
+        return messageDiv;
+    }
+    
+    function renderChatListItem(chat) {
+        const item = document.createElement('a');
+        item.href = `/chat/${chat.id}`;
+        item.className = 'list-group-item list-group-item-action bg-dark text-light border-light';
+        item.innerHTML = `
+            <div class="d-flex w-100 justify-content-between">
+                <h6 class="mb-1 text-truncate">${escapeHtml(chat.title)}</h6>
+                <div class="d-flex align-items-center">
+                    <small class="me-2">${chat.short_date}</small>
+                    ${chat.title !== 'New Chat' ? `
+                    <button class="btn btn-sm btn-outline-danger delete-chat" data-chat-id="${chat.id}" title="Delete chat">
+                        <i class="fas fa-trash"></i>
+                    </button>` : ''}
+                </div>
+            </div>
+        `;
+        return item;
     }
     
     function scrollToBottom() {
@@ -131,15 +322,50 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // Each playback gets an id so starting a new one abandons the previous queue
+    let playbackId = 0;
+    
     function playMessageAudio(messageId) {
               // Find the specific message content by messageId
               const messageElement = document.querySelector(`.play-message[data-message-id="${messageId}"]`).closest('.message').querySelector('.markdown-content');
         if (!messageElement) return;
         
         const messageText = messageElement.textContent;
+        const currentPlayback = ++playbackId;
+        const audioQueue = [];
+        let received = 0;
+        let playing = false;
+        
+        function playNext() {
+            if (currentPlayback !== playbackId) return;
+            
+            const nextUrl = audioQueue.shift();
+            if (nextUrl === undefined) {
+                playing = false;
+                return;
+            }
+            
+            playing = true;
+            audioPlayer.src = nextUrl;
+            audioPlayer.onended = playNext;
+            audioPlayer.play();
+        }
         
-        // Convert message to speech
-        fetch('/api/text_to_speech', {
+        function enqueue(line) {
+            if (!line.trim()) return;
+            const chunk = JSON.parse(line);
+            if (chunk.audio_url) {
+                received++;
+                audioQueue.push(chunk.audio_url);
+                // Start playing as soon as the first sentence is ready
+                if (!playing) playNext();
+            }
+        }
+        
+        audioPlayer.pause();
+        
+        // Convert message to speech one sentence at a time
+        fetch('/api/text_to_speech_stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -149,12 +375,34 @@ document.addEventListener('DOMContentLoaded', function() {
                 language: currentLanguage
             })
         })
-        .then(response => response.json())
-        .then(data => {
-            if (data.audio_data) {
-                audioPlayer.src = `data:audio/mp3;base64,${data.audio_data}`;
-                audioPlayer.play();
+        .then(response => {
+            if (!response.ok || !response.body) {
+                throw new Error('Speech request failed');
             }
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            
+            function read() {
+                return reader.read().then(({ done, value }) => {
+                    if (done || currentPlayback !== playbackId) {
+                        if (buffer) enqueue(buffer);
+                        if (done && received === 0) {
+                            showNotification('Failed to generate audio.', 'danger');
+                        }
+                        return;
+                    }
+                    
+                    buffer += decoder.decode(value, { stream: true });
+                    const lines = buffer.split('\n');
+                    buffer = lines.pop();
+                    lines.forEach(enqueue);
+                    return read();
+                });
+            }
+            
+            return read();
         })
         .catch(error => {
             console.error('Error:', error);
@@ -174,29 +422,30 @@ document.addEventListener('DOMContentLoaded', function() {
         
         showNotification('Translating chat messages...', 'info');
         
-        botMessages.forEach(messageElement => {
-            const originalText = messageElement.textContent;
-            
-            fetch('/api/translate', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({
-                    text: originalText,
-                    language: currentLanguage
-                })
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.translated_text) {
-                    messageElement.innerHTML = processMarkdown(data.translated_text);
-                }
+        const originalTexts = Array.from(botMessages).map(messageElement => messageElement.textContent);
+        
+        // Translate every message in a single request
+        fetch('/api/translate', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                texts: originalTexts,
+                language: currentLanguage
             })
-            .catch(error => {
-                console.error('Error:', error);
-                showNotification('Translation failed. Please try again.', 'danger');
-            });
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.translated_texts) {
+                data.translated_texts.forEach((translatedText, index) => {
+                    botMessages[index].innerHTML = processMarkdown(translatedText);
+                });
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            showNotification('Translation failed. Please try again.', 'danger');
         });
     }
     
@@ -320,42 +569,43 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    // Delete chat functionality
-    document.querySelectorAll('.delete-chat').forEach(button => {
-        button.addEventListener('click', function(e) {
-            e.preventDefault();
-            e.stopPropagation(); // Prevent the chat link from being clicked
-            
-            const chatId = this.getAttribute('data-chat-id');
-            
-            if (confirm('Are you sure you want to delete this chat? This action cannot be undone.')) {
-                fetch(`/api/delete_chat/${chatId}`, {
-                    method: 'DELETE',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    }
-                })
-                .then(response => {
-                    if (response.ok) {
-                        // Remove the chat item from the list
-                        const chatItem = this.closest('.list-group-item');
-                        chatItem.remove();
-                        
-                        // If this was the current chat, redirect to new chat
-                        if (chatId === document.getElementById('chat-id').value) {
-                            window.location.href = '/chat/new';
-                        }
-                        
-                        showNotification('Chat deleted successfully.', 'success');
-                    } else {
-                        throw new Error('Failed to delete chat');
+    // Delete chat functionality; delegated so chats loaded later are covered too
+    chatList.addEventListener('click', function(e) {
+        const button = e.target.closest('.delete-chat');
+        if (!button) return;
+        
+        e.preventDefault();
+        e.stopPropagation(); // Prevent the chat link from being clicked
+        
+        const chatId = button.getAttribute('data-chat-id');
+        
+        if (confirm('Are you sure you want to delete this chat? This action cannot be undone.')) {
+            fetch(`/api/delete_chat/${chatId}`, {
+                method: 'DELETE',
+                headers: {
+                    'Content-Type': 'application/json'
+                }
+            })
+            .then(response => {
+                if (response.ok) {
+                    // Remove the chat item from the list
+                    const chatItem = button.closest('.list-group-item');
+                    chatItem.remove();
+                    
+                    // If this was the current chat, redirect to new chat
+                    if (chatId === document.getElementById('chat-id').value) {
+                        window.location.href = '/chat/new';
                     }
-                })
-                .catch(error => {
-                    console.error('Error:', error);
-                    showNotification('There was an error deleting the chat. Please try again.', 'danger');
-                });
-            }
-        });
+                    
+                    showNotification('Chat deleted successfully.', 'success');
+                } else {
+                    throw new Error('Failed to delete chat');
+                }
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                showNotification('There was an error deleting the chat. Please try again.', 'danger');
+            });
+        }
     });
 });
@@ -0,0 +1,63 @@
+// Dashboard functionality
+document.addEventListener('DOMContentLoaded', function() {
+    const weatherCard = document.getElementById('weather-card');
+    const chatList = document.getElementById('chat-list');
+    
+    // Weather is loaded after the page renders so a slow weather API never delays the dashboard
+    if (weatherCard && weatherCard.dataset.loaded !== 'true') {
+        loadWeather();
+    }
+    
+    // Older chats load as the Recent Chats list is scrolled
+    if (chatList) {
+        setupChatListPaging(chatList, renderChat);
+    }
+    
+    function renderChat(chat) {
+        const item = document.createElement('a');
+        item.href = `/chat/${chat.id}`;
+        item.className = 'list-group-item list-group-item-action bg-dark text-light border-light';
+        item.innerHTML = `
+            <div class="d-flex w-100 justify-content-between">
+                <h6 class="mb-1">${escapeHtml(chat.title)}</h6>
+                <small>${chat.date}</small>
+            </div>
+            ${chat.preview ?
+                `<p class="mb-1 text-truncate">${escapeHtml(chat.preview)}</p>` :
+                '<p class="mb-1"><em>No messages yet</em></p>'}
+        `;
+        return item;
+    }
+    
+    function loadWeather() {
+        fetch('/api/weather')
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Weather data unavailable');
+            }
+            return response.json();
+        })
+        .then(data => {
+            const weather = data.weather;
+            
+            document.getElementById('weather-temperature').textContent = weather.temperature;
+            document.getElementById('weather-description').textContent = weather.description;
+            document.getElementById('weather-humidity').textContent = weather.humidity;
+            document.getElementById('weather-wind').textContent = weather.wind_speed;
+            
+            if (weather.icon) {
+                const weatherIcon = document.getElementById('weather-icon');
+                weatherIcon.src = `https:${weather.icon}`;
+                weatherIcon.classList.remove('d-none');
+            }
+            
+            document.getElementById('weather-loading').classList.add('d-none');
+            document.getElementById('weather-details').classList.remove('d-none');
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            // Hide the widget, as the dashboard did before when weather was unavailable
+            weatherCard.remove();
+        });
+    }
+});
@@ -106,3 +106,50 @@ function showNotification(message, type = 'success') {
         bsAlert.close();
     }, 5000);
 }
+
+// Helper function to escape text before inserting it as HTML
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+// Load further pages of a chat list from /api/chats as it is scrolled.
+// The list's data-next-cursor holds the cursor of the next page ('' when done).
+function setupChatListPaging(list, renderChat, withPreviews = true) {
+    let loading = false;
+    
+    function loadMore() {
+        const cursor = list.dataset.nextCursor;
+        if (!cursor || loading) return;
+        loading = true;
+        
+        fetch(`/api/chats?before=${encodeURIComponent(cursor)}&previews=${withPreviews}`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Failed to load chats');
+            }
+            return response.json();
+        })
+        .then(data => {
+            data.chats.forEach(chat => list.appendChild(renderChat(chat)));
+            list.dataset.nextCursor = data.next_cursor || '';
+            loading = false;
+            fillList();
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            loading = false;
+        });
+    }
+    
+    // Load when the end of the list is in view, including when it doesn't overflow yet
+    function fillList() {
+        if (list.scrollHeight - list.scrollTop - list.clientHeight < 50) {
+            loadMore();
+        }
+    }
+    
+    list.addEventListener('scroll', fillList);
+    fillList();
+}
@@ -117,7 +117,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 });
                 
                 mediaRecorder.addEventListener("stop", () => {
-                    const audioBlob = new Blob(audioChunks);
+                    const audioBlob = new Blob(audioChunks, { type: mediaRecorder.mimeType || 'audio/webm' });
                     sendAudioToServer(audioBlob);
                 });
                 
@@ -148,34 +148,28 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     function sendAudioToServer(audioBlob) {
-        const reader = new FileReader();
-        reader.readAsDataURL(audioBlob);
-        reader.onloadend = () => {
-            const base64Audio = reader.result.split(',')[1];
-            
-            fetch('/api/speech_to_text', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({
-                    audio_data: base64Audio,
-                    language: languageSelect.value
-                })
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.text) {
-                    messageInput.value = data.text;
-                    messageInput.focus();
-                } else {
-                    showNotification('Could not recognize speech. Please try again.', 'warning');
-                }
-            })
-            .catch(error => {
-                console.error('Speech recognition error:', error);
-                showNotification('Error processing your speech. Please try again.', 'danger');
-            });
-        };
+        // Upload the recording as-is; the server decodes WebM/Opus/WAV without base64
+        const language = encodeURIComponent(languageSelect.value);
+        
+        fetch(`/api/speech_to_text_upload?language=${language}`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': audioBlob.type || 'audio/webm'
+            },
+            body: audioBlob
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.text) {
+                messageInput.value = data.text;
+                messageInput.focus();
+            } else {
+                showNotification(data.error || 'Could not recognize speech. Please try again.', 'warning');
+            }
+        })
+        .catch(error => {
+            console.error('Speech recognition error:', error);
+            showNotification('Error processing your speech. Please try again.', 'danger');
+        });
     }
 });
@@ -0,0 +1,24 @@
+import os
+import sys
+import tempfile
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The suite runs on a throwaway SQLite database, chosen before the app is imported
+_database_dir = tempfile.mkdtemp(prefix='farmwise-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_database_dir, 'test.db')}"
+
+@pytest.fixture(scope='session')
+def app():
+    """The app with routes registered and every table created"""
+    from app import create_app, db
+
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,30 @@
+import itertools
+import catalog
+import crop_engine
+from bulk_recommendations import generate_ndjson, plot_error, score_plots
+
+SOILS = sorted({soil.lower() for crop in catalog.get_crops() for soil in crop['suitable_soil_types']}) + ['mud']
+LOCATIONS = ['Punjab', 'Ludhiana, Punjab', 'Kerala', 'Tamil Nadu', 'Nowhere']
+PHS = [4.5, 5.5, 6.0, 6.5, 6.7, 7.2, 8.0]
+TEMPERATURES = [None, 12, 22, 27, 35]
+
+def test_bulk_matches_single_shortlists():
+    plots = [{'soil_type': soil, 'soil_ph': ph, 'location': location, 'temperature': temperature}
+             for soil, ph, location, temperature in itertools.product(SOILS, PHS, LOCATIONS, TEMPERATURES)]
+
+    for season in ('Kharif', 'Rabi'):
+        for plot, bulk in zip(plots, score_plots(plots, season)):
+            single = crop_engine.shortlist(plot['soil_type'], plot['soil_ph'], plot['location'],
+                                           plot['temperature'], season)
+            assert [(item['crop']['name'], item['score']) for item in single] == bulk, plot
+
+def test_temperature_must_be_a_number_when_given():
+    assert plot_error({'soil_ph': 6.5, 'temperature': 'hot'}) == 'temperature must be a number'
+    assert plot_error({'soil_ph': 6.5, 'temperature': 'nan'}) == 'temperature must be a number'
+    assert plot_error({'soil_ph': 6.5, 'temperature': '21.5'}) is None
+    assert plot_error({'soil_ph': 6.5, 'temperature': ''}) is None
+    assert plot_error({'soil_ph': 6.5}) is None
+
+def test_invalid_temperature_gets_an_error_line():
+    lines = list(generate_ndjson([{'plot_id': 'a', 'soil_ph': 6.5, 'temperature': 'hot'}]))
+    assert '"type": "error"' in lines[0] and '"plot_id": "a"' in lines[0]
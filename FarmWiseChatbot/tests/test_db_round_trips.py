@@ -0,0 +1,98 @@
+"""
+Database round-trip budget for the sign-up and chat write paths.
+
+Drives sign-up (register, resend_otp, verify_email), password reset and
+both chat endpoints through the test client, with Gemini replaced by a
+canned reply, and fails when a route makes more round trips (statements
+plus commits, as counted by query_counter) or more commits than its budget
+allows.
+"""
+import uuid
+import pytest
+from flask import g, request, request_tearing_down
+
+# endpoint: (round trips, commits)
+BUDGETS = {
+    'register': (5, 1),
+    'resend_otp': (4, 1),
+    'verify_email': (4, 1),
+    'forgot_password': (4, 1),
+    'reset_password': (4, 1),
+    'send_message': (5, 1),
+    'send_message_stream': (5, 1),
+}
+
+class CannedReply:
+    text = "Sow wheat in the first half of November."
+
+    def __iter__(self):
+        yield self
+
+def drive(app):
+    """Send each budgeted request once (send_message twice: first message and follow-up)"""
+    from app import db
+    from models import Chat, User
+    from email_utils import EmailVerification, PasswordReset
+
+    suffix = uuid.uuid4().hex[:8]
+    email = f'budget-{suffix}@example.com'
+    client = app.test_client()
+    client.post('/register', data={'username': f'budget-{suffix}', 'email': email, 'password': 'budget',
+                                   'confirm_password': 'budget', 'location': 'Ludhiana', 'language': 'en'})
+    client.get(f'/resend_otp/{email}')
+    with app.app_context():
+        otp = EmailVerification.query.filter_by(email=email).order_by(EmailVerification.id.desc()).first().otp
+    client.post(f'/verify_email/{email}', data={'otp': otp})
+
+    client.post('/forgot_password', data={'email': email})
+    with app.app_context():
+        token = PasswordReset.query.filter_by(email=email).first().token
+    client.post(f'/reset_password/{token}', data={'password': 'budget', 'confirm_password': 'budget'})
+
+    with app.app_context():
+        user = User.query.filter_by(email=email).first()
+        chat = Chat(user_id=user.id)
+        db.session.add(chat)
+        db.session.commit()
+        chat_id = chat.id
+
+    client.post('/login', data={'email': email, 'password': 'budget'})
+    # First message (renames the chat), then follow-ups that carry history
+    client.post('/api/send_message', json={'chat_id': chat_id, 'message': 'When should I sow wheat?'})
+    client.post('/api/send_message', json={'chat_id': chat_id, 'message': 'And how much seed per acre?'})
+    client.post('/api/send_message_stream', json={'chat_id': chat_id, 'message': 'Which variety?'}).get_data()
+
+@pytest.fixture(scope='module')
+def measured(app):
+    """[(endpoint, round trips, commits)] for every budgeted request"""
+    import llm
+    import query_counter
+
+    results = []
+
+    # A streamed response is torn down twice; the second call overwrites the first
+    def collect(sender, **extra):
+        if request.endpoint in BUDGETS:
+            if 'budget_index' not in g:
+                g.budget_index = len(results)
+                results.append(None)
+            results[g.budget_index] = (request.endpoint, query_counter.round_trips(), query_counter.commits())
+
+    generate = llm.generate
+    llm.generate = lambda prompt, stream=False, **kwargs: CannedReply()
+    try:
+        with request_tearing_down.connected_to(collect, app):
+            drive(app)
+    finally:
+        llm.generate = generate
+    return results
+
+@pytest.mark.parametrize('endpoint', sorted(BUDGETS))
+def test_round_trip_budget(measured, endpoint):
+    max_round_trips, max_commits = BUDGETS[endpoint]
+    requests = [(round_trips, commits) for name, round_trips, commits in measured if name == endpoint]
+
+    assert requests, f"{endpoint} was not exercised"
+    for round_trips, commits in requests:
+        assert round_trips <= max_round_trips, f"{endpoint}: {round_trips} round trips (budget {max_round_trips})"
+        assert commits <= max_commits, f"{endpoint}: {commits} commits (budget {max_commits})"
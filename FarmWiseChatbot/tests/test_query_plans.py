@@ -0,0 +1,145 @@
+"""
+Index and query plan checks for the hot lookups.
+
+Builds a fresh database with `flask db upgrade`, checks that the migrations
+created the hot lookup indexes, then runs EXPLAIN on each hot query and
+fails when one of them scans its whole table (or sorts rows that an index
+should already return in order), e.g. after a migration drops or changes
+an index.
+
+Runs on SQLite, and also on PostgreSQL when TEST_POSTGRES_URL points at a
+database the suite may migrate. On PostgreSQL sequential scans are
+disabled for the check, so an index that exists is used even when the
+table is tiny.
+"""
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+import pytest
+import sqlalchemy as sa
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# table: index names the migrations must leave behind
+INDEXES = {
+    'chat': {'ix_chat_user_id_created_at_id'},
+    'message': {'ix_message_chat_id_created_at_id'},
+    'email_verification': {'ix_email_verification_email_verified_created'},
+    'password_reset': {'ix_password_reset_token_is_used'},
+    'email_outbox': {'ix_email_outbox_status_next_attempt'},
+}
+
+def hot_queries():
+    """(name, table, query, ordered) for every query that must use an index"""
+    from pagination import encode_cursor, keyset_query
+    from models import Chat, Message, UserProfile
+    from email_utils import EmailOutbox, EmailVerification, PasswordReset
+
+    cursor = encode_cursor(datetime.utcnow(), 1)
+    return [
+        ('chat list', 'chat',
+         keyset_query(Chat.query.filter_by(user_id=1), Chat).limit(11), True),
+        ('chat list page', 'chat',
+         keyset_query(Chat.query.filter_by(user_id=1), Chat, cursor).limit(11), True),
+        ('chat history', 'message',
+         keyset_query(Message.query.filter_by(chat_id=1), Message).limit(31), True),
+        ('chat history page', 'message',
+         keyset_query(Message.query.filter_by(chat_id=1), Message, cursor).limit(31), True),
+        ('user profile', 'user_profile',
+         UserProfile.query.filter_by(user_id=1), False),
+        ('latest OTP', 'email_verification',
+         EmailVerification.query.filter_by(email='farmer@example.com', is_verified=False)
+         .order_by(EmailVerification.created_at.desc()), True),
+        ('reset token', 'password_reset',
+         PasswordReset.query.filter_by(token='token', is_used=False), False),
+        ('due outbox emails', 'email_outbox',
+         EmailOutbox.query.filter(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= datetime.utcnow())
+         .order_by(EmailOutbox.next_attempt_at), True),
+        ('expired outbox claims', 'email_outbox',
+         EmailOutbox.query.filter(EmailOutbox.status == 'sending', EmailOutbox.next_attempt_at <= datetime.utcnow()),
+         False),
+    ]
+
+def explain(connection, query):
+    """Return the plan as a list of node descriptions"""
+    dialect = connection.dialect
+    compiled = query.statement.compile(dialect=dialect)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+
+    if dialect.name == 'postgresql':
+        rows = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params).scalar()
+        plan = rows if isinstance(rows, list) else json.loads(rows)
+
+        nodes = []
+        def walk(node):
+            nodes.append(f"{node['Node Type']} {node.get('Relation Name', '')}".strip())
+            for child in node.get('Plans', []):
+                walk(child)
+        walk(plan[0]['Plan'])
+        return nodes
+
+    return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)]
+
+def problems(dialect_name, table, nodes, ordered):
+    found = []
+    for node in nodes:
+        if dialect_name == 'postgresql':
+            if node == f"Seq Scan {table}":
+                found.append('sequential scan')
+            elif ordered and node.startswith(('Sort', 'Incremental Sort')):
+                found.append('sort')
+        else:
+            if node == f"SCAN {table}":
+                found.append('sequential scan')
+            elif ordered and 'TEMP B-TREE FOR ORDER BY' in node:
+                found.append('sort')
+    return found
+
+def migrate(url):
+    """Run `flask db upgrade` against url in a separate process"""
+    env = dict(os.environ, DATABASE_URL=url)
+    result = subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'db', 'upgrade'],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, f"flask db upgrade failed:\n{result.stderr}"
+
+@pytest.fixture(scope='module', params=['sqlite', 'postgresql'])
+def migrated_engine(request, tmp_path_factory):
+    """An engine on a database built by the migrations alone"""
+    if request.param == 'sqlite':
+        url = f"sqlite:///{tmp_path_factory.mktemp('migrated') / 'migrated.db'}"
+    else:
+        url = os.environ.get('TEST_POSTGRES_URL')
+        if not url:
+            pytest.skip('TEST_POSTGRES_URL is not set')
+
+    migrate(url)
+    engine = sa.create_engine(url)
+    yield engine
+    engine.dispose()
+
+def test_migrations_create_hot_lookup_indexes(migrated_engine):
+    inspector = sa.inspect(migrated_engine)
+    for table, expected in INDEXES.items():
+        names = {index['name'] for index in inspector.get_indexes(table)}
+        assert expected <= names, f"{table} is missing {', '.join(sorted(expected - names))}"
+
+    constraints = {constraint['name'] for constraint in inspector.get_unique_constraints('user_profile')}
+    assert 'uq_user_profile_user_id' in constraints
+
+def test_hot_queries_use_an_index(app, migrated_engine):
+    failures = []
+    with app.app_context(), migrated_engine.connect() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.exec_driver_sql('SET enable_seqscan = off')
+
+        for name, table, query, ordered in hot_queries():
+            nodes = explain(connection, query)
+            found = problems(connection.dialect.name, table, nodes, ordered)
+            if found:
+                failures.append(f"{name}: {', '.join(found)} on {table} ({' / '.join(nodes)})")
+
+    assert not failures, '\n'.join(failures)
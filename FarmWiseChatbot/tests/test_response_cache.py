@@ -0,0 +1,59 @@
+import response_cache
+from response_cache import HashingEmbedder, SemanticCache
+
+SCOPE = ('en',)
+
+def test_expired_answer_is_replaced(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, 'monotonic', lambda: now[0])
+    cache = SemanticCache(HashingEmbedder(), ttl=60, max_entries=100)
+
+    cache.store('How to control brown planthopper in rice?', SCOPE, 'old answer', 1500)
+    now[0] += 61
+    assert cache.lookup('How to control brown planthopper in rice?', SCOPE) is None
+
+    cache.store('How to control brown planthopper in rice?', SCOPE, 'new answer', 1500)
+    assert cache.lookup('How to control brown planthopper in rice?', SCOPE) == ('new answer', 1.0)
+    assert cache.lookup('how to control brown plant hopper in rice', SCOPE)[0] == 'new answer'
+    assert len(cache._scopes[SCOPE].entries) == 1
+
+def test_live_answer_is_kept(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, 'monotonic', lambda: now[0])
+    cache = SemanticCache(HashingEmbedder(), ttl=60, max_entries=100)
+
+    cache.store('When to sow wheat?', SCOPE, 'first answer', 900)
+    now[0] += 30
+    cache.store('When to sow wheat?', SCOPE, 'second answer', 900)
+    assert cache.lookup('When to sow wheat?', SCOPE) == ('first answer', 1.0)
+
+# Pairs the hashing embedder scores above its threshold that need different answers
+DIFFERENT_QUESTIONS = [
+    ('How do I control brown planthopper in my rice field?', 'How do I control brown planthopper in my wheat field?'),
+    ('Which pesticide is safe to spray on tomato?', 'Which pesticide is not safe to spray on tomato?'),
+    ('What is the recommended dose of urea per acre for paddy?', 'What is the recommended dose of DAP per acre for paddy?'),
+    ('Should I spray urea on my paddy?', 'Should I not spray urea on my paddy?'),
+    ('How much water for 1 acre of sugarcane?', 'How much water for 2 acres of sugarcane?'),
+]
+
+def test_different_questions_miss():
+    embedder = HashingEmbedder()
+    cache = SemanticCache(embedder, ttl=60, max_entries=100)
+
+    for question, other in DIFFERENT_QUESTIONS:
+        cache.store(question, SCOPE, f'answer to {question}', 1000)
+        assert cache.lookup(other, SCOPE) is None, other
+
+def test_rewordings_hit():
+    cache = SemanticCache(HashingEmbedder(), ttl=60, max_entries=100)
+    cache.store('How do I control brown planthopper in my rice field?', SCOPE, 'answer', 1000)
+
+    for question in ['how to control brown plant hopper in rice field',
+                     'Brown planthopper in rice field: how control?']:
+        assert cache.lookup(question, SCOPE) is not None, question
+
+def test_cache_is_off_by_default():
+    from app import app
+
+    assert app.config['SEMANTIC_CACHE_ENABLED'] is False
+    assert response_cache.get_cache() is None
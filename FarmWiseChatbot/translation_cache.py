@@ -0,0 +1,200 @@
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select
+from app import app, db
+import metrics
+
+# Run the shared-tier size/TTL cleanup after this many writes
+SHARED_PRUNE_INTERVAL = 100
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with a per-entry TTL"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+_memory_cache = LRUCache(app.config['TRANSLATION_CACHE_SIZE'], app.config['TRANSLATION_CACHE_TTL'])
+_shared_writes = 0
+_shared_writes_lock = threading.Lock()
+
+def normalize_text(text):
+    """Normalise text so trivially different copies share a cache entry"""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+def cache_key(text, target_language):
+    """Build the (text hash, language) key for a translation"""
+    digest = hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+    return digest, target_language
+
+def get_translations(texts, target_language):
+    """
+    Look up many cached translations, checking memory first and then the
+    shared table in one query
+
+    Returns:
+        dict: {text: translation} for the texts found
+    """
+    found = {}
+    missing = {}
+    for text in texts:
+        key = cache_key(text, target_language)
+        translated = _memory_cache.get(key)
+        if translated is not None:
+            metrics.increment('translation_cache.memory_hit')
+            found[text] = translated
+        else:
+            missing.setdefault(key, []).append(text)
+
+    if missing and app.config['TRANSLATION_CACHE_SHARED']:
+        for key, translated in _get_shared([text_hash for text_hash, _ in missing], target_language).items():
+            metrics.increment('translation_cache.shared_hit')
+            _memory_cache.set(key, translated)
+            for text in missing.pop(key):
+                found[text] = translated
+
+    if missing:
+        metrics.increment('translation_cache.miss', sum(len(texts) for texts in missing.values()))
+    return found
+
+def get_translation(text, target_language):
+    """
+    Look up a cached translation, checking memory first and then the shared table
+
+    Returns:
+        str or None: The cached translation, or None on a miss
+    """
+    return get_translations([text], target_language).get(text)
+
+def set_translations(translations, target_language):
+    """
+    Store translations in every enabled cache tier, with one write to the shared table
+
+    Args:
+        translations (list): (text, translation) pairs
+        target_language (str): Language code of the translations
+    """
+    rows = {}
+    for text, translated in translations:
+        key = cache_key(text, target_language)
+        _memory_cache.set(key, translated)
+        rows[key] = translated
+
+    if rows and app.config['TRANSLATION_CACHE_SHARED']:
+        _set_shared(rows)
+
+def set_translation(text, target_language, translated):
+    """Store a translation in every enabled cache tier"""
+    set_translations([(text, translated)], target_language)
+
+def clear():
+    """Empty the in-process tier"""
+    _memory_cache.clear()
+
+# The shared tier uses its own connections, never db.session: committing or
+# rolling back here must not touch the request's pending changes
+
+def _shared_table():
+    from models import TranslationCacheEntry
+    return TranslationCacheEntry.__table__
+
+def _get_shared(text_hashes, language):
+    table = _shared_table()
+    cutoff = datetime.utcnow() - timedelta(seconds=app.config['TRANSLATION_CACHE_TTL'])
+
+    try:
+        with db.engine.connect() as connection:
+            rows = connection.execute(
+                select(table.c.text_hash, table.c.translated_text)
+                .where(table.c.language == language, table.c.text_hash.in_(text_hashes),
+                       table.c.created_at >= cutoff)
+            ).all()
+        return {(row.text_hash, language): row.translated_text for row in rows}
+
+    except Exception as e:
+        app.logger.error(f"Translation cache read error: {str(e)}")
+        return {}
+
+def _upsert(table, rows):
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    statement = insert(table).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.text_hash, table.c.language],
+        set_={'translated_text': statement.excluded.translated_text, 'created_at': statement.excluded.created_at}
+    )
+
+def _set_shared(rows):
+    """Upsert {(text hash, language): translation} into the shared table in one statement"""
+    global _shared_writes
+    table = _shared_table()
+    now = datetime.utcnow()
+
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(_upsert(table, [
+                {'text_hash': text_hash, 'language': language, 'translated_text': translated, 'created_at': now}
+                for (text_hash, language), translated in rows.items()
+            ]))
+
+        with _shared_writes_lock:
+            before = _shared_writes
+            _shared_writes += len(rows)
+            should_prune = before // SHARED_PRUNE_INTERVAL != _shared_writes // SHARED_PRUNE_INTERVAL
+        if should_prune:
+            prune_shared()
+
+    except Exception as e:
+        app.logger.error(f"Translation cache write error: {str(e)}")
+
+def prune_shared():
+    """Drop expired rows and trim the shared table to its configured size"""
+    table = _shared_table()
+    cutoff = datetime.utcnow() - timedelta(seconds=app.config['TRANSLATION_CACHE_TTL'])
+
+    with db.engine.begin() as connection:
+        connection.execute(delete(table).where(table.c.created_at < cutoff))
+
+        boundary = connection.execute(
+            select(table.c.created_at).order_by(table.c.created_at.desc())
+            .offset(app.config['TRANSLATION_CACHE_SHARED_SIZE']).limit(1)
+        ).scalar()
+        if boundary is not None:
+            connection.execute(delete(table).where(table.c.created_at <= boundary))
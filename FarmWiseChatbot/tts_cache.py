@@ -0,0 +1,146 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import metrics
+
+KEY_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+class AudioCache:
+    """
+    Content-addressed, disk-backed cache of synthesized MP3 audio.
+
+    Files are named by hash(language, text), so the same sentence in the
+    same language is only ever synthesized once and its URL never changes.
+    Hits refresh the file's mtime and the least recently used files are
+    deleted once the directory grows past max_bytes. The directory's size
+    is kept as a running total, so only an eviction (or a periodic resync
+    with files written by other workers) scans it.
+    """
+
+    # Writes between rescans of the directory's real size
+    RESCAN_EVERY = 500
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self._key_locks = {}
+        self._total_bytes = None
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key_for(text, language):
+        normalized = ' '.join(text.split())
+        return hashlib.sha256(f"{language}\0{normalized}".encode('utf-8')).hexdigest()
+
+    def path_for(self, key):
+        if not KEY_PATTERN.match(key):
+            raise ValueError(f"Invalid audio key: {key}")
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def exists(self, key):
+        return os.path.exists(self.path_for(key))
+
+    def get_or_create(self, text, language, synthesize):
+        """
+        Return the key for text's audio, calling synthesize(text, language) -> bytes on a miss
+        """
+        key = self.key_for(text, language)
+        path = self.path_for(key)
+
+        if self._touch(path):
+            metrics.increment('tts_cache.hit')
+            return key
+
+        # One synthesis per key, even when several requests miss at once
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                if self._touch(path):
+                    metrics.increment('tts_cache.hit')
+                    return key
+
+                metrics.increment('tts_cache.miss')
+                with metrics.timer('tts.synthesize'):
+                    audio = synthesize(text, language)
+                self._write(path, audio)
+        finally:
+            with self._lock:
+                self._key_locks.pop(key, None)
+
+        if self._record_write(len(audio)):
+            self._evict()
+        return key
+
+    def _record_write(self, size):
+        """Add a new file to the running total; True when it's time to scan the directory"""
+        with self._lock:
+            self._writes += 1
+            if self._total_bytes is None or self._writes % self.RESCAN_EVERY == 0:
+                return True
+            self._total_bytes += size
+            return self._total_bytes > self.max_bytes
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _write(self, path, audio):
+        # Write to a temp file and rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def _evict(self):
+        # Scans run outside the main lock, one at a time; a miss that finds
+        # one under way leaves the eviction to it
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            entries = []
+            total = 0
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith('.mp3'):
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                        total += stat.st_size
+
+            if total <= self.max_bytes:
+                self._set_total(total)
+                return
+
+            # Drop least recently used files until comfortably under the limit
+            target = self.max_bytes * 0.9
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                    total -= size
+                    metrics.increment('tts_cache.evicted')
+                except FileNotFoundError:
+                    pass
+            self._set_total(total)
+        finally:
+            self._evict_lock.release()
+
+    def _set_total(self, total):
+        with self._lock:
+            self._total_bytes = total
@@ -0,0 +1,91 @@
+"""
+Per-user cache of the logged-in user, their farm profile and the profile
+part of the chat prompt.
+
+Flask-Login loads the user on every authenticated request and the chat
+routes need the profile on every message; both come from here, so a busy
+chat makes no identity or profile reads at all. A miss loads user and
+profile in one query. Entries live for USER_CONTEXT_TTL seconds and are
+dropped explicitly when the profile or password changes. Each worker has
+its own cache, so an edit made through another worker shows up within
+the TTL.
+
+The cached User and UserProfile are detached from any session: read them,
+but load a fresh copy to change anything.
+"""
+import threading
+import time
+from collections import OrderedDict
+from app import app, db
+from models import User, UserProfile
+from chatbot import profile_context
+import metrics
+
+class UserContext:
+    __slots__ = ('user', 'profile', 'prompt_context', 'expires_at')
+
+    def __init__(self, user, profile, expires_at):
+        self.user = user
+        self.profile = profile
+        self.prompt_context = profile_context(profile)
+        self.expires_at = expires_at
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+def _load(user_id):
+    row = db.session.query(User, UserProfile).outerjoin(
+        UserProfile, UserProfile.user_id == User.id
+    ).filter(User.id == user_id).first()
+    if row is None:
+        return None
+
+    # Detach them so a later commit in this request can't expire them
+    user, profile = row
+    db.session.expunge(user)
+    if profile is not None:
+        db.session.expunge(profile)
+    return UserContext(user, profile, time.monotonic() + app.config['USER_CONTEXT_TTL'])
+
+def get(user_id):
+    """
+    The cached context for a user, loading it on a miss
+
+    Returns:
+        UserContext or None: None if the user doesn't exist
+    """
+    now = time.monotonic()
+    with _lock:
+        context = _entries.get(user_id)
+        if context is not None and context.expires_at > now:
+            _entries.move_to_end(user_id)
+            metrics.increment('user_context.hit')
+            return context
+
+    metrics.increment('user_context.miss')
+    context = _load(user_id)
+    if context is None:
+        return None
+
+    with _lock:
+        _entries[user_id] = context
+        _entries.move_to_end(user_id)
+        while len(_entries) > app.config['USER_CONTEXT_CACHE_SIZE']:
+            _entries.popitem(last=False)
+    return context
+
+def invalidate(user_id):
+    """Drop a user's cached context after their user or profile row changed"""
+    with _lock:
+        _entries.pop(user_id, None)
+
+def invalidate_email(email):
+    """Drop the cached context of the user with this email"""
+    with _lock:
+        for user_id, context in list(_entries.items()):
+            if context.user.email == email:
+                del _entries[user_id]
+
+def clear():
+    with _lock:
+        _entries.clear()
@@ -1,15 +1,22 @@
 import os
+import re
 import base64
-import requests
 import json
 from io import BytesIO
-from gtts import gTTS
-import speech_recognition as sr
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from app import app
+import catalog
+import llm
+import outbound
+import speech_backends
+import translation_cache
+import tts_cache
+import weather_cache
+import metrics
 
-def get_weather_data(location):
+def fetch_weather_data(location):
     """
-    Get weather data using WeatherAPI.com
+    Get weather data using WeatherAPI.com, bypassing the cache
     """
     try:
         api_key = app.config['WEATHER_API_KEY']
@@ -21,10 +28,11 @@ def get_weather_data(location):
             'aqi': 'no'
         }
         
-        response = requests.get(base_url, params=params)
+        response = outbound.run(outbound.get(base_url, params, timeout=app.config['WEATHER_TIMEOUT']),
+                                app.config['WEATHER_DEADLINE'], 'weather.upstream')
         data = response.json()
         
-        if response.ok:
+        if response.is_success:
             return {
                 'temperature': data['current']['temp_c'],
                 'humidity': data['current']['humidity'],
@@ -41,94 +49,449 @@ def get_weather_data(location):
         app.logger.error(f"Error fetching weather data: {str(e)}")
         return None
 
+_weather_cache = weather_cache.SingleFlightCache(
+    fetch_weather_data,
+    ttl=app.config['WEATHER_CACHE_TTL'],
+    stale_ttl=app.config['WEATHER_STALE_TTL'],
+    error_ttl=app.config['WEATHER_ERROR_TTL'],
+    name='weather_cache'
+)
+
+def get_weather_data(location):
+    """
+    Get weather data for a location, served from the per-location cache
+    """
+    if not location:
+        return None
+    return _weather_cache.get(weather_cache.normalize_location(location), location)
+
+def get_cached_weather_data(location):
+    """
+    Get weather data only if it is already cached; never calls WeatherAPI
+    """
+    if not location:
+        return None
+    return _weather_cache.peek(weather_cache.normalize_location(location))
+
+def prefetch_weather(locations):
+    """
+    Warm the weather cache for a set of locations, one upstream call per distinct location
+    """
+    keys = {weather_cache.normalize_location(location): location for location in locations if location}
+    # Locations are independent, so their upstream calls overlap
+    outbound.map_blocking(lambda item: _weather_cache.get(*item), keys.items(), name='weather.prefetch')
+    return len(keys)
+
+def start_weather_prefetcher(interval):
+    """
+    Refresh weather for every distinct User.location every interval seconds in a daemon thread
+    """
+    import threading
+    import time
+    from app import db
+    from models import User
+    
+    def run():
+        while True:
+            try:
+                with app.app_context():
+                    locations = [row[0] for row in db.session.query(User.location).distinct()]
+                    db.session.remove()
+                count = prefetch_weather(locations)
+                app.logger.info(f"Prefetched weather for {count} locations")
+            except Exception as e:
+                app.logger.error(f"Weather prefetch error: {str(e)}")
+            time.sleep(interval)
+    
+    thread = threading.Thread(target=run, name='weather-prefetcher', daemon=True)
+    thread.start()
+    return thread
+
+# Unicode blocks used by each supported language's script
+LANGUAGE_SCRIPTS = {
+    'hi': (0x0900, 0x097F),  # Devanagari
+    'mr': (0x0900, 0x097F),  # Devanagari
+    'bn': (0x0980, 0x09FF),  # Bengali
+    'pa': (0x0A00, 0x0A7F),  # Gurmukhi
+    'gu': (0x0A80, 0x0AFF),  # Gujarati
+    'ta': (0x0B80, 0x0BFF),  # Tamil
+    'te': (0x0C00, 0x0C7F),  # Telugu
+    'kn': (0x0C80, 0x0CFF),  # Kannada
+    'ml': (0x0D00, 0x0D7F),  # Malayalam
+}
+
+def is_text_in_language(text, language_code, min_ratio=0.5):
+    """
+    Check whether text is written in the script of the given language.
+    
+    Only letters are counted, so markdown, digits and the odd English crop
+    or chemical name don't make a correct answer fail the check.
+    """
+    letters = [ch for ch in text if ch.isalpha()]
+    if not letters:
+        return True
+    
+    if language_code in LANGUAGE_SCRIPTS:
+        low, high = LANGUAGE_SCRIPTS[language_code]
+        matching = sum(1 for ch in letters if low <= ord(ch) <= high)
+    else:
+        matching = sum(1 for ch in letters if ord(ch) < 0x0250)  # Latin script
+    
+    return matching / len(letters) >= min_ratio
+
 def translate_text(text, target_language):
     """
     Translate text to target language using Google Generative AI
     """
+    if not text:
+        return text
+    
+    cached = translation_cache.get_translation(text, target_language)
+    if cached is not None:
+        return cached
+    
     try:
-        # Use Gemini model for translation
-        import google.generativeai as genai
-        
-        GEMINI_API_KEY = app.config['GEMINI_API_KEY']
-        genai.configure(api_key=GEMINI_API_KEY)
-        
-        # Load language data to get the full language name
-        with open('static/data/languages.json', 'r', encoding='utf-8') as f:
-            languages = json.load(f)
-        
-        language_name = next((lang['name'] for lang in languages if lang['code'] == target_language), target_language)
+        language_name = catalog.get_language_name(target_language)
         
         prompt = f"Translate the following text to {language_name}. Return only the translated text without any explanations:\n\n{text}"
         
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content(prompt)
+        # Use Gemini model for translation
+        response = llm.generate(prompt)
         
         translated_text = response.text.strip()
+        translation_cache.set_translation(text, target_language, translated_text)
         return translated_text
     
     except Exception as e:
         app.logger.error(f"Translation error: {str(e)}")
         return text  # Return original text if translation fails
 
-def text_to_speech(text, language='en'):
+def _parse_batch_response(response_text, expected_count):
     """
-    Convert text to speech and return as base64 encoded audio
+    Parse a JSON array of translations, returning None if it doesn't line up
     """
+    cleaned = response_text.strip()
+    if cleaned.startswith('```'):
+        cleaned = cleaned.strip('`')
+        cleaned = cleaned[cleaned.find('['):]
+    
     try:
-        # Map language codes to gTTS language codes
-        language_map = {
-            'en': 'en',
-            'hi': 'hi',
-            'ta': 'ta',
-            'te': 'te',
-            'ml': 'ml',
-            'kn': 'kn',
-            'bn': 'bn',
-            'gu': 'gu',
-            'mr': 'mr',
-            'pa': 'pa'
-        }
+        translations = json.loads(cleaned)
+    except ValueError:
+        return None
+    
+    if not isinstance(translations, list) or len(translations) != expected_count:
+        return None
+    if not all(isinstance(item, str) for item in translations):
+        return None
+    
+    return [item.strip() for item in translations]
+
+def translate_batch(texts, target_language):
+    """
+    Translate many strings with a single Gemini call
+    
+    Cached and duplicate strings are skipped, the rest are sent as JSON
+    arrays of up to TRANSLATION_BATCH_SIZE strings, all batches at once, and
+    matched back by position. If a batch's reply can't be split back
+    reliably, each of its strings falls back to translate_text. Strings
+    still untranslated after TRANSLATION_DEADLINE are returned as-is.
+    
+    Args:
+        texts (list): Strings to translate
+        target_language (str): Target language code
         
-        tts_lang = language_map.get(language, 'en')
+    Returns:
+        list: Translations in the same order as texts
+    """
+    unique = list(dict.fromkeys(text for text in texts if text))
+    results = translation_cache.get_translations(unique, target_language)
+    pending = [text for text in unique if text not in results]
+    
+    batch_size = app.config['TRANSLATION_BATCH_SIZE']
+    batches = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+    if not batches:
+        return [results.get(text, text) for text in texts]
+    
+    language_name = catalog.get_language_name(target_language)
+    
+    def generate(batch):
+        prompt = (f"Translate each string in the following JSON array to {language_name}. "
+                  f"Return only a JSON array of {len(batch)} strings containing the translations "
+                  f"in the same order, without any explanations:\n\n"
+                  f"{json.dumps(batch, ensure_ascii=False)}")
+        return llm.generate(prompt, response_mime_type='application/json')
+    
+    # Only the Gemini calls run in parallel; the caches are read and written here
+    try:
+        responses = outbound.map_blocking(generate, batches, app.config['TRANSLATION_DEADLINE'],
+                                          'translation.upstream')
+    except outbound.DeadlineExceeded as e:
+        app.logger.error(f"Batch translation error: {str(e)}")
+        return [results.get(text, text) for text in texts]
+    
+    translated_batches = []
+    for batch, response in zip(batches, responses):
+        translations = None
         
-        # Generate speech
-        tts = gTTS(text=text, lang=tts_lang, slow=False)
+        try:
+            if isinstance(response, Exception):
+                raise response
+            translations = _parse_batch_response(response.text, len(batch))
         
-        # Save to BytesIO object
-        fp = BytesIO()
-        tts.write_to_fp(fp)
-        fp.seek(0)
+        except Exception as e:
+            app.logger.error(f"Batch translation error: {str(e)}")
         
-        # Convert to base64
-        audio_base64 = base64.b64encode(fp.read()).decode('utf-8')
+        if translations is None:
+            app.logger.warning(f"Batch translation of {len(batch)} strings failed, translating one by one")
+            metrics.increment('translation.batch_fallback')
+            translations = [translate_text(text, target_language) for text in batch]
+        else:
+            metrics.increment('translation.batch')
+            translated_batches.extend(zip(batch, translations))
         
-        return audio_base64
+        results.update(zip(batch, translations))
+    
+    # Cache every batch's translations with a single write
+    translation_cache.set_translations(translated_batches, target_language)
+    return [results.get(text, text) for text in texts]
+
+# Map language codes to gTTS language codes
+TTS_LANGUAGE_MAP = {
+    'en': 'en',
+    'hi': 'hi',
+    'ta': 'ta',
+    'te': 'te',
+    'ml': 'ml',
+    'kn': 'kn',
+    'bn': 'bn',
+    'gu': 'gu',
+    'mr': 'mr',
+    'pa': 'pa'
+}
+
+_audio_cache = tts_cache.AudioCache(app.config['TTS_CACHE_DIR'], app.config['TTS_CACHE_MAX_BYTES'])
+
+def synthesize_speech(text, language='en'):
+    """
+    Synthesize text with gTTS and return the MP3 bytes
+    """
+    tts_lang = TTS_LANGUAGE_MAP.get(language, 'en')
+    
+    # Generate speech
+    from gtts import gTTS
+    tts = gTTS(text=text, lang=tts_lang, slow=False, timeout=app.config['TTS_TIMEOUT'])
+    
+    # Save to BytesIO object
+    fp = BytesIO()
+    tts.write_to_fp(fp)
+    return fp.getvalue()
+
+def text_to_speech_key(text, language='en'):
+    """
+    Convert text to speech via the audio cache and return the audio's cache key
+    """
+    try:
+        return _audio_cache.get_or_create(text, language, synthesize_speech)
     
     except Exception as e:
         app.logger.error(f"Text-to-speech error: {str(e)}")
         return None
 
+def get_audio_path(key):
+    """
+    Path of a cached audio file, or None if the key is unknown
+    """
+    try:
+        return _audio_cache.path_for(key) if _audio_cache.exists(key) else None
+    except ValueError:
+        return None
+
+_tts_executor = ThreadPoolExecutor(max_workers=app.config['TTS_WORKERS'], thread_name_prefix='tts')
+
+def strip_markdown(text):
+    """
+    Remove markdown syntax so it isn't read aloud
+    """
+    text = re.sub(r'```.*?```', ' ', text, flags=re.S)
+    text = re.sub(r'!?\[([^\]]*)\]\([^)]*\)', r'\1', text)  # Links and images keep their label
+    text = re.sub(r'https?://\S+', ' ', text)
+    text = re.sub(r'^\s{0,3}#{1,6}\s*(.*?)\s*#*\s*$', r'\1.', text, flags=re.M)  # Headings end a sentence
+    text = re.sub(r'^\s*(?:[-*+]|\d+[.)])\s+', '', text, flags=re.M)  # List markers
+    text = re.sub(r'[*_`~>|]+', '', text)
+    return text
+
+def split_sentences(text, max_chars=200):
+    """
+    Split plain text into sentence-sized chunks for speech synthesis
+    
+    Sentences end at ., !, ? or the Devanagari danda, or at a line break.
+    Very short sentences are merged with the next one so each chunk is worth
+    a request, and each chunk stays under max_chars where possible.
+    """
+    sentences = [part.strip() for part in re.split(r'(?<=[.!?\u0964\u0965])\s+|\n+', text)]
+    
+    chunks = []
+    current = ''
+    for sentence in sentences:
+        if not sentence or not any(ch.isalnum() for ch in sentence):
+            continue
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+        if len(current) >= max_chars // 4 and current[-1] in '.!?\u0964\u0965':
+            chunks.append(current)
+            current = ''
+    if current:
+        chunks.append(current)
+    return chunks
+
+def text_to_speech_chunks(text, language='en'):
+    """
+    Synthesize text sentence by sentence, yielding each chunk's audio cache key in order
+    
+    All chunks are queued on the shared TTS thread pool at once, so later
+    sentences are synthesized while earlier ones are already playing.
+    Repeated sentences come straight from the audio cache. A sentence that
+    fails or isn't ready within TTS_CHUNK_DEADLINE yields None, so one
+    stalled sentence doesn't hold up the rest.
+    """
+    chunks = split_sentences(strip_markdown(text))
+    futures = [_tts_executor.submit(_audio_cache.get_or_create, chunk, language, synthesize_speech)
+               for chunk in chunks]
+    deadline = app.config['TTS_CHUNK_DEADLINE']
+    
+    try:
+        for index, future in enumerate(futures):
+            try:
+                yield future.result(timeout=deadline)
+            except FutureTimeoutError:
+                metrics.increment('tts.chunk_deadline_exceeded')
+                app.logger.error(f"Text-to-speech chunk {index} took longer than {deadline}s")
+                yield None
+            except Exception as e:
+                app.logger.error(f"Text-to-speech chunk error: {str(e)}")
+                yield None
+    finally:
+        # Don't synthesize the rest if the client went away
+        for future in futures:
+            future.cancel()
+
+def text_to_speech(text, language='en'):
+    """
+    Convert text to speech and return as base64 encoded audio
+    """
+    key = text_to_speech_key(text, language)
+    if key is None:
+        return None
+    
+    with open(_audio_cache.path_for(key), 'rb') as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+# Compressed formats are transcoded to 16 kHz mono PCM with ffmpeg
+TRANSCODED_AUDIO_TYPES = ('audio/webm', 'audio/ogg', 'audio/opus', 'video/webm')
+PCM_SAMPLE_RATE = 16000
+PCM_SAMPLE_WIDTH = 2
+
+class AudioInputError(ValueError):
+    """Raised when uploaded audio is too large, too long or in an unsupported format"""
+    
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def recognize_audio(audio, language='en'):
+    """
+    Recognize speech in an sr.AudioData clip with the configured backend
+    """
+    return speech_backends.recognize(audio, language)
+
+def _read_wav(stream, max_seconds):
+    import speech_recognition as sr
+    
+    # The WAV header gives the duration, so long clips are rejected before any frames are read
+    with sr.AudioFile(stream) as source:
+        if source.DURATION > max_seconds:
+            raise AudioInputError(f"Audio is longer than {max_seconds} seconds", 413)
+        return sr.Recognizer().record(source)
+
+def _transcode_to_pcm(stream, max_seconds):
+    import shutil
+    import subprocess
+    import threading
+    import speech_recognition as sr
+    
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        raise AudioInputError("WebM/Opus audio needs ffmpeg on the server", 415)
+    
+    # Pipe the upload straight into ffmpeg; -t stops decoding at the duration limit
+    process = subprocess.Popen(
+        [ffmpeg, '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0', '-t', str(max_seconds),
+         '-f', 's16le', '-ac', '1', '-ar', str(PCM_SAMPLE_RATE), 'pipe:1'],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    
+    def feed():
+        try:
+            shutil.copyfileobj(stream, process.stdin, 64 * 1024)
+        except (BrokenPipeError, OSError):
+            pass
+        finally:
+            process.stdin.close()
+    
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+    pcm = process.stdout.read()
+    process.wait()
+    feeder.join()
+    
+    if process.returncode != 0:
+        raise AudioInputError(f"Could not decode audio: {process.stderr.read().decode('utf-8', 'replace').strip()}", 415)
+    
+    return sr.AudioData(pcm, PCM_SAMPLE_RATE, PCM_SAMPLE_WIDTH)
+
+def speech_to_text_stream(stream, content_type, language='en'):
+    """
+    Convert speech to text from a binary audio stream (WAV, WebM or Ogg/Opus)
+    
+    WAV is read directly from the stream; WebM and Opus are piped through
+    ffmpeg. Neither path base64-decodes or buffers the upload separately.
+    
+    Raises:
+        AudioInputError: If the audio is too long or can't be decoded
+    """
+    import speech_recognition as sr
+    
+    mimetype = (content_type or '').split(';')[0].strip().lower()
+    max_seconds = app.config['STT_MAX_DURATION']
+    
+    if mimetype in TRANSCODED_AUDIO_TYPES:
+        audio = _transcode_to_pcm(stream, max_seconds)
+    elif mimetype in ('audio/wav', 'audio/x-wav', 'audio/wave', 'application/octet-stream', ''):
+        try:
+            audio = _read_wav(stream, max_seconds)
+        except (ValueError, EOFError) as e:
+            if isinstance(e, AudioInputError):
+                raise
+            raise AudioInputError(f"Could not read WAV audio: {str(e)}", 415)
+    else:
+        raise AudioInputError(f"Unsupported audio type: {mimetype}", 415)
+    
+    try:
+        return recognize_audio(audio, language)
+    except sr.UnknownValueError:
+        return ""
+
 def speech_to_text(audio_data, language='en'):
     """
     Convert speech to text from base64 encoded audio
     """
+    import speech_recognition as sr
+    
     try:
-        # Map language codes to speech recognition language codes
-        language_map = {
-            'en': 'en-US',
-            'hi': 'hi-IN',
-            'ta': 'ta-IN',
-            'te': 'te-IN',
-            'ml': 'ml-IN',
-            'kn': 'kn-IN',
-            'bn': 'bn-IN',
-            'gu': 'gu-IN',
-            'mr': 'mr-IN',
-            'pa': 'pa-IN'
-        }
-        
-        recognition_lang = language_map.get(language, 'en-US')
-        
         # Decode base64 audio
         audio_bytes = base64.b64decode(audio_data)
         
@@ -139,7 +502,7 @@ def speech_to_text(audio_data, language='en'):
         recognizer = sr.Recognizer()
         with sr.AudioFile(audio_file) as source:
             audio = recognizer.record(source)
-            text = recognizer.recognize_google(audio, language=recognition_lang)
+            text = recognize_audio(audio, language)
             
         return text
     
@@ -0,0 +1,108 @@
+import re
+import threading
+import time
+import metrics
+
+def normalize_location(location):
+    """Collapse case, spacing and punctuation so 'Pune,  Maharashtra' and 'pune, maharashtra' share an entry"""
+    return re.sub(r'\s*,\s*', ',', ' '.join((location or '').lower().split())).strip(',')
+
+class _Entry:
+    __slots__ = ('value', 'fresh_until', 'stale_until')
+
+    def __init__(self, value, fresh_until, stale_until):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+class SingleFlightCache:
+    """
+    TTL cache that coalesces concurrent misses into one load per key.
+
+    Within ttl an entry is served as-is. Between ttl and stale_ttl it is
+    still served, while one background thread reloads it. Past stale_ttl,
+    or on a miss, the first caller loads the value and every concurrent
+    caller for the same key waits for that single load instead of issuing
+    its own. Failed loads (None) are kept for error_ttl so a broken
+    location doesn't hit the upstream on every request.
+    """
+
+    def __init__(self, loader, ttl, stale_ttl, error_ttl, name='cache', max_entries=10000):
+        self.loader = loader
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.error_ttl = error_ttl
+        self.name = name
+        self._entries = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, *args):
+        """Return the cached value for key, loading it with loader(*args) if needed"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry.fresh_until:
+                metrics.increment(f'{self.name}.hit')
+                return entry.value
+
+            if entry is not None and now < entry.stale_until:
+                metrics.increment(f'{self.name}.stale_hit')
+                if key not in self._inflight:
+                    self._inflight[key] = threading.Event()
+                    threading.Thread(target=self._load, args=(key, args), daemon=True).start()
+                return entry.value
+
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+
+        if leader:
+            metrics.increment(f'{self.name}.miss')
+            return self._load(key, args)
+
+        metrics.increment(f'{self.name}.coalesced')
+        event.wait()
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry.value if entry is not None else None
+
+    def _load(self, key, args):
+        value = None
+        try:
+            value = self.loader(*args)
+        finally:
+            now = time.monotonic()
+            with self._lock:
+                if value is not None:
+                    self._entries[key] = _Entry(value, now + self.ttl, now + self.stale_ttl)
+                else:
+                    previous = self._entries.get(key)
+                    if previous is None or now >= previous.stale_until:
+                        self._entries[key] = _Entry(None, now + self.error_ttl, now + self.error_ttl)
+                    else:
+                        # Keep serving the stale value, but back off before retrying
+                        previous.fresh_until = now + self.error_ttl
+                if len(self._entries) > self.max_entries:
+                    self._evict_expired(now)
+                self._inflight.pop(key).set()
+        return value
+
+    def _evict_expired(self, now):
+        expired = [key for key, entry in self._entries.items() if now >= entry.stale_until]
+        for key in expired:
+            del self._entries[key]
+
+    def peek(self, key):
+        """Return the cached value without loading or refreshing it"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or time.monotonic() >= entry.stale_until:
+            return None
+        return entry.value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()